@@ -0,0 +1,3 @@
+"""
+Benchmarks locales de PromptGuard. Se ejecutan con `python -m benchmarks.<modulo>`.
+"""
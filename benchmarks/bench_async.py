@@ -0,0 +1,80 @@
+"""
+Prueba de carga: handler síncrono en un pool de hilos contra el handler `async def`.
+
+El camino síncrono se limita a `--threads` hilos, como el pool del worker de
+Python (`PYTHON_THREADPOOL_THREAD_COUNT`); el asíncrono mantiene hasta
+`--concurrency` llamadas en vuelo sobre un solo hilo.
+
+Uso:
+    python -m benchmarks.bench_async --requests 2000 --threads 16 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import azure.functions as func
+
+from benchmarks.stub_server import StubServer
+
+
+def http_request(prompt):
+    return func.HttpRequest(
+        method="POST",
+        url="/validatePrompt",
+        headers={"Content-Type": "application/json"},
+        body=json.dumps({"prompt": prompt}).encode("utf-8"),
+    )
+
+
+def run_sync(check_content_safety, total, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(check_content_safety, ["Hola"] * total))
+    assert not any(r["is_flagged"] for r in results)
+    return total / (time.perf_counter() - start)
+
+
+async def run_async(function_app, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await function_app.validate_prompt(http_request("Hola"))
+            assert response.status_code == 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="latencia simulada de Content Safety")
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency_ms / 1000) as server:
+        os.environ["CONTENT_SAFETY_ENDPOINT"] = server.endpoint
+        os.environ["CONTENT_SAFETY_KEY"] = "stub"
+        os.environ.setdefault("HTTP_POOL_SIZE", str(max(args.threads, args.concurrency)))
+        # Todas las solicitudes deben llegar al stub: sin pre-filtro ni caché de veredictos
+        os.environ["PREFILTER_ENABLED"] = "false"
+        os.environ["VERDICT_CACHE_SIZE"] = "0"
+        import function_app
+        from shared_code.content_safety import check_content_safety
+
+        sync_rps = run_sync(check_content_safety, args.requests, args.threads)
+        async_rps = asyncio.run(run_async(function_app, args.requests, args.concurrency))
+
+    print(f"síncrono ({args.threads} hilos):          {sync_rps:10.1f} req/s")
+    print(f"asíncrono ({args.concurrency} en vuelo):  {async_rps:10.1f} req/s")
+    print(f"mejora: x{async_rps / sync_rps:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compara `requests.post` suelto contra la sesión compartida de `shared_code.http_pool`.
+
+Uso:
+    python -m benchmarks.bench_http_pool --requests 500 --threads 16 --handshake-ms 20
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stub_server import StubServer
+from shared_code.http_pool import PooledSession
+
+HEADERS = {"Content-Type": "application/json", "Ocp-Apim-Subscription-Key": "stub"}
+BODY = {"text": "Hola, ¿cómo estás?"}
+
+
+def run(post, url, total, threads):
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        response = post(url, headers=HEADERS, json=BODY)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="latencia simulada por solicitud")
+    parser.add_argument("--handshake-ms", type=float, default=20.0, help="costo simulado por conexión nueva")
+    args = parser.parse_args()
+
+    print(f"{'cliente':<18}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'conexiones':>12}")
+    for name in ("requests.post", "PooledSession"):
+        with StubServer(latency=args.latency_ms / 1000, handshake_delay=args.handshake_ms / 1000) as server:
+            url = f"{server.endpoint}/contentsafety/text:analyze?api-version=2023-10-01"
+            session = PooledSession(pool_size=args.threads) if name == "PooledSession" else None
+            result = run(session.post if session else requests.post, url, args.requests, args.threads)
+            print(f"{name:<18}{result['rps']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{server.connections:>12}")
+            if session:
+                print(f"  métricas del pool: {session.metrics()}")
+                session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Evalúa el pre-filtro local sobre un corpus JSONL (`{"prompt": ...}` por línea) y
+reporta qué fracción de las llamadas a Content Safety se evitan.
+
+Uso:
+    python -m benchmarks.bench_prefilter --corpus benchmarks/data/prefilter_corpus.jsonl -v
+"""
+import argparse
+import json
+import os
+import time
+
+from shared_code.prefilter import Prefilter
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "prefilter_corpus.jsonl")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("-v", "--verbose", action="store_true", help="muestra la decisión de cada prompt")
+    args = parser.parse_args()
+
+    prefilter = Prefilter.from_env()
+    with open(args.corpus, encoding="utf-8") as f:
+        prompts = [json.loads(line)["prompt"] for line in f if line.strip()]
+
+    start = time.perf_counter()
+    for prompt in prompts:
+        result = prefilter.classify(prompt)
+        if args.verbose:
+            print(f"{result['decision']:<10} {result['reason']:<45} {prompt[:60]!r}")
+    elapsed = time.perf_counter() - start
+
+    stats = prefilter.stats()
+    print(f"\nprompts: {stats['total']}  rechazados: {stats['reject']}  aprobados: {stats['pass']}  dudosos: {stats['ambiguous']}")
+    print(f"llamadas a Content Safety evitadas: {stats['upstream_avoided_ratio']:.1%}")
+    print(f"costo medio del pre-filtro: {elapsed / len(prompts) * 1e6:.1f} µs por prompt")
+
+
+if __name__ == "__main__":
+    main()
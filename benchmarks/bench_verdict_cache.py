@@ -0,0 +1,55 @@
+"""
+Latencia de `check_content_safety` con la caché de veredictos: primera llamada
+(va al stub de Content Safety) contra prompts repetidos (aciertos de caché).
+
+Uso:
+    python -m benchmarks.bench_verdict_cache --prompts 200 --repeats 20
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.stub_server import StubServer
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=200, help="prompts distintos")
+    parser.add_argument("--repeats", type=int, default=20, help="repeticiones de cada prompt")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency_ms / 1000) as server:
+        os.environ["CONTENT_SAFETY_ENDPOINT"] = server.endpoint
+        os.environ["CONTENT_SAFETY_KEY"] = "stub"
+        os.environ["PREFILTER_ENABLED"] = "false"
+        from shared_code.content_safety import check_content_safety
+        from shared_code.verdict_cache import verdict_cache
+
+        misses, hits = [], []
+        prompts = [f"Prompt de prueba número {i}" for i in range(args.prompts)]
+        for prompt in prompts:
+            start = time.perf_counter()
+            check_content_safety(prompt)
+            misses.append(time.perf_counter() - start)
+        for _ in range(args.repeats):
+            for prompt in prompts:
+                # Variantes triviales (mayúsculas/espacios) comparten la misma clave
+                start = time.perf_counter()
+                check_content_safety(f"  {prompt.upper()} ")
+                hits.append(time.perf_counter() - start)
+
+        print(f"{'':<10}{'p50 µs':>12}{'p99 µs':>12}")
+        for name, values in (("miss", misses), ("hit", hits)):
+            print(f"{name:<10}{statistics.median(values) * 1e6:>12.1f}{percentile(values, 0.99) * 1e6:>12.1f}")
+        print(f"llamadas al stub: {server.requests}; caché: {verdict_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
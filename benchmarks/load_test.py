@@ -0,0 +1,125 @@
+"""
+Prueba de carga de los handlers de `function_app` contra los stubs locales.
+
+Levanta `StubServer` (Content Safety, Azure OpenAI y Language), apunta las
+variables de entorno a él e invoca el handler elegido con `--concurrency`
+solicitudes en vuelo. Reporta throughput, códigos de estado y percentiles de
+latencia extremo a extremo, más los histogramas por etapa de `/metrics`.
+
+Por defecto cada prompt es distinto y el pre-filtro y las cachés de veredictos
+y de respuestas están apagados, para que todas las solicitudes lleguen a los servicios; con
+`--keep-shortcuts` se mantienen como en producción.
+
+Uso:
+    python -m benchmarks.load_test validatePrompt --requests 2000 --concurrency 100
+    python -m benchmarks.load_test generateResponse --openai-ms 800 --throttle-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+import azure.functions as func
+
+from benchmarks.stub_server import StubServer
+
+HANDLERS = {
+    "validatePrompt": "validate_prompt",
+    "generateResponse": "generate_response",
+    "processPrompt": "process_prompt",
+    "validateAndGenerate": "validate_and_generate",
+}
+
+
+def http_request(route, prompt):
+    return func.HttpRequest(
+        method="POST",
+        url=f"/api/{route}",
+        headers={"Content-Type": "application/json"},
+        body=json.dumps({"prompt": prompt}).encode("utf-8"),
+    )
+
+
+def load_prompts(path, total):
+    if path:
+        with open(path, encoding="utf-8") as f:
+            prompts = [json.loads(line)["prompt"] for line in f if line.strip()]
+        return [prompts[i % len(prompts)] for i in range(total)]
+    return [f"Consulta de prueba número {i}: ¿cuál es la capital de Francia?" for i in range(total)]
+
+
+async def run(handler, route, prompts, concurrency, histogram):
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = Counter()
+
+    async def one(prompt):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await handler(http_request(route, prompt))
+            histogram.record(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(prompt) for prompt in prompts))
+    return time.perf_counter() - start, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("handler", choices=sorted(HANDLERS))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--prompts", help="corpus JSONL (`{\"prompt\": ...}` por línea); por defecto prompts sintéticos")
+    parser.add_argument("--content-safety-ms", type=float, default=80.0, help="latencia simulada de Content Safety")
+    parser.add_argument("--openai-ms", type=float, default=500.0, help="latencia simulada de Azure OpenAI")
+    parser.add_argument("--language-ms", type=float, default=60.0, help="latencia simulada de Azure Language")
+    parser.add_argument("--jitter", type=float, default=0.2, help="variación aleatoria de la latencia (fracción)")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fracción de respuestas con latencia extra")
+    parser.add_argument("--tail-ms", type=float, default=1000.0, help="latencia extra de la cola lenta")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fracción de respuestas 429")
+    parser.add_argument("--keep-shortcuts", action="store_true", help="mantiene el pre-filtro y las cachés")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    latency = {"contentSafety": args.content_safety_ms / 1000, "openai": args.openai_ms / 1000,
+               "language": args.language_ms / 1000}
+    with StubServer(latency=latency, jitter=args.jitter, error_rate=args.error_rate,
+                    throttle_rate=args.throttle_rate, tail_rate=args.tail_rate, tail_latency=args.tail_ms / 1000,
+                    seed=args.seed) as server:
+        for name in ("CONTENT_SAFETY_ENDPOINT", "LANGUAGE_ENDPOINT", "OPENAI_ENDPOINT"):
+            os.environ[name] = server.endpoint
+        for name in ("CONTENT_SAFETY_KEY", "LANGUAGE_KEY", "OPENAI_KEY"):
+            os.environ[name] = "stub"
+        os.environ.setdefault("HTTP_POOL_SIZE", str(args.concurrency))
+        # La cuota del limitador no debe ser el cuello de botella salvo que se pida
+        os.environ.setdefault("OPENAI_TPM_LIMIT", "100000000")
+        os.environ.setdefault("OPENAI_RPM_LIMIT", "1000000")
+        if not args.keep_shortcuts:
+            os.environ["PREFILTER_ENABLED"] = "false"
+            os.environ["VERDICT_CACHE_SIZE"] = "0"
+            os.environ["RESPONSE_CACHE_SIZE"] = "0"
+        import function_app
+        from shared_code.telemetry import LatencyHistogram, stage_metrics
+
+        histogram = LatencyHistogram()
+        elapsed, statuses = asyncio.run(run(
+            getattr(function_app, HANDLERS[args.handler]), args.handler,
+            load_prompts(args.prompts, args.requests), args.concurrency, histogram
+        ))
+
+    summary = histogram.snapshot()
+    print(f"{args.handler}: {args.requests} solicitudes, {args.concurrency} en vuelo")
+    print(f"throughput: {args.requests / elapsed:.1f} req/s")
+    print(f"estados:    {dict(sorted(statuses.items()))}")
+    print(f"latencia:   p50 {summary['p50']} ms  p95 {summary['p95']} ms  p99 {summary['p99']} ms  max {summary['max']} ms")
+    print(f"upstream:   {dict(server.calls)} en {server.connections} conexiones")
+    print("\netapa                          n      p50      p95      p99  (ms)")
+    for stage, stats in stage_metrics.snapshot().items():
+        print(f"{stage:<24} {stats['count']:>8} {stats['p50']:>8} {stats['p95']:>8} {stats['p99']:>8}")
+
+
+if __name__ == "__main__":
+    main()
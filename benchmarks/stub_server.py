@@ -0,0 +1,203 @@
+"""
+Servidor HTTP local que imita los servicios de Azure que usa PromptGuard:
+
+- Content Safety: `POST /contentsafety/text:analyze`
+- Azure OpenAI: `POST /openai/deployments/<implementación>/chat/completions`
+  (también `/chat/completions` de OpenAI directo), con o sin `stream`.
+- Azure Language: `POST /language/:analyze-text` (reconocimiento de entidades).
+
+`latency` puede ser un número (segundos, igual para todos) o un dict por
+servicio (`{"contentSafety": 0.1, "openai": 0.8, "language": 0.05}`); `jitter`
+la varía al azar en ±esa fracción y `tail_rate` suma `tail_latency` a esa
+fracción de las respuestas (cola lenta). `error_rate` responde 500 y `throttle_rate`
+responde 429 con `retry-after-ms`, como el servicio real al pasar la cuota.
+
+`handshake_delay` se aplica una sola vez por conexión nueva, para simular el
+costo del handshake TCP+TLS contra el endpoint real.
+
+Content Safety marca con severidad 6 (Violence) los textos que contienen
+`UNSAFE_MARKER`, para probar el camino de contenido inseguro.
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAFE_ANALYSIS = {
+    "blocklistsMatch": [],
+    "categoriesAnalysis": [
+        {"category": "Hate", "severity": 0},
+        {"category": "SelfHarm", "severity": 0},
+        {"category": "Sexual", "severity": 0},
+        {"category": "Violence", "severity": 0},
+    ],
+}
+
+UNSAFE_MARKER = "[[unsafe]]"
+
+_CHAT_PATH = re.compile(r"^(?:/openai/deployments/(?P<deployment>[^/]+))?/(?:v1/)?chat/completions$")
+
+
+def _chat_completion(deployment, prompt):
+    content = f"Respuesta simulada para: {prompt[:80]}"
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(content) // 4)
+    return content, {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": deployment,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def _chat_stream(deployment, prompt):
+    content, completion = _chat_completion(deployment, prompt)
+    base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": completion["created"], "model": deployment}
+    events = []
+    for word in re.findall(r"\S+\s*", content):
+        events.append({**base, "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]})
+    events.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+    events.append({**base, "choices": [], "usage": completion["usage"]})
+    return "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+
+
+def _entities(body):
+    documents = body.get("analysisInput", {}).get("documents", [])
+    return {
+        "kind": "EntityRecognitionResults",
+        "results": {
+            "documents": [{"id": doc["id"], "entities": [], "warnings": []} for doc in documents],
+            "errors": [],
+            "modelVersion": "stub",
+        },
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Necesario para keep-alive
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def do_HEAD(self):
+        # El precalentamiento de clientes sólo abre la conexión
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.split("?", 1)[0]
+
+        chat = _CHAT_PATH.match(path)
+        if path.endswith("/text:analyze"):
+            service = "contentSafety"
+        elif chat:
+            service = "openai"
+        elif path.endswith("/:analyze-text"):
+            service = "language"
+        else:
+            return self._send(404, {"error": {"code": "NotFound", "message": path}})
+
+        self.server.record(service)
+        time.sleep(self.server.latency_for(service))
+
+        roll = self.server.random()
+        if roll < self.server.throttle_rate:
+            return self._send(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                              headers={"retry-after-ms": str(self.server.retry_after_ms), "retry-after": "1"})
+        if roll < self.server.throttle_rate + self.server.error_rate:
+            return self._send(500, {"error": {"code": "InternalServerError", "message": "Error simulado"}})
+
+        if service == "contentSafety":
+            if UNSAFE_MARKER in body.get("text", ""):
+                return self._send(200, {**SAFE_ANALYSIS, "categoriesAnalysis": [
+                    {**item, "severity": 6 if item["category"] == "Violence" else 0}
+                    for item in SAFE_ANALYSIS["categoriesAnalysis"]
+                ]})
+            return self._send(200, SAFE_ANALYSIS)
+        if service == "language":
+            return self._send(200, _entities(body))
+
+        deployment = chat.group("deployment") or body.get("model", "stub")
+        prompt = " ".join(m.get("content") or "" for m in body.get("messages", []) if m.get("role") == "user")
+        quota = {"x-ratelimit-remaining-requests": "1000", "x-ratelimit-remaining-tokens": "1000000"}
+        if body.get("stream"):
+            return self._send(200, _chat_stream(deployment, prompt), headers=quota, content_type="text/event-stream")
+        return self._send(200, _chat_completion(deployment, prompt)[1], headers=quota)
+
+    def _send(self, status, payload, headers=None, content_type="application/json"):
+        data = (payload if isinstance(payload, str) else json.dumps(payload)).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, latency=0.0, handshake_delay=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after_ms=1000, tail_rate=0.0, tail_latency=0.0, seed=None):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.handshake_delay = handshake_delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after_ms = retry_after_ms
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.connections = 0
+        self.requests = 0
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def record(self, service):
+        with self._lock:
+            self.requests += 1
+            self.calls[service] += 1
+
+    def random(self):
+        with self._lock:
+            return self._random.random()
+
+    def latency_for(self, service):
+        latency = self.latency.get(service, 0.0) if isinstance(self.latency, dict) else self.latency
+        if latency and self.jitter:
+            latency *= 1 + self.jitter * (2 * self.random() - 1)
+        if self.tail_rate and self.random() < self.tail_rate:
+            latency += self.tail_latency
+        return max(0.0, latency)
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
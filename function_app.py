@@ -1,116 +1,169 @@
 import azure.functions as func
 import logging
 import json
-import os
-import requests
-from azure.ai.textanalytics import TextAnalyticsClient
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.contentsafety import ContentSafetyClient
-from azure.core.exceptions import HttpResponseError
-import openai
+import typing
+from shared_code.batch_validation import parse_message, validate_batch
+from shared_code.circuit_breaker import circuit_breaker_stats
+from shared_code.clients import registry
+from shared_code.content_safety import hedger
+from shared_code.engine import handle_generate, handle_validate, handle_validate_and_generate, speculation_stats
+from shared_code.pii import pii_detector
+from shared_code.pipeline import language_batcher, run_pipeline
+from shared_code.prefilter import prefilter
+from shared_code.rate_limiter import rate_limiter
+from shared_code.response_cache import response_cache
+from shared_code.router import model_router
+from shared_code.singleflight import single_flight_stats
+from shared_code.streaming import stream_completion
+from shared_code.telemetry import stage, stage_metrics
+from shared_code.tokens import PromptTooLong
+from shared_code.verdict_cache import verdict_cache
+
+# Streaming HTTP: requiere la extensión de FastAPI y PYTHON_ENABLE_INIT_INDEXING=1
+try:
+    from azurefunctions.extensions.http.fastapi import JSONResponse, Request, StreamingResponse
+except ImportError:
+    StreamingResponse = None
 
 # Inicializar la aplicación de Azure Functions
 app = func.FunctionApp()
 
-# Cargar variables de entorno
-CONTENT_SAFETY_ENDPOINT = os.getenv("CONTENT_SAFETY_ENDPOINT")
-CONTENT_SAFETY_KEY = os.getenv("CONTENT_SAFETY_KEY")
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-def check_content_safety(prompt):
-    """
-    Envía el prompt a Azure Content Safety y devuelve si fue marcado como inseguro.
-    """
-    if not CONTENT_SAFETY_ENDPOINT or not CONTENT_SAFETY_KEY:
-        logging.error("Faltan las credenciales de Azure Content Safety")
-        return {"is_flagged": True, "details": "Credenciales no configuradas"}
-
-    try:
-        headers = {
-            "Content-Type": "application/json",
-            "Ocp-Apim-Subscription-Key": CONTENT_SAFETY_KEY
-        }
-        data = {"text": prompt}
-
-        response = requests.post(
-            f"{CONTENT_SAFETY_ENDPOINT}/contentsafety/text:analyze?api-version=2023-10-01",
-            headers=headers,
-            json=data
-        )
-
-        if response.status_code != 200:
-            logging.error(f"Error en Content Safety: {response.text}")
-            return {"is_flagged": True, "details": f"Error en API: {response.status_code}"}
-
-        result = response.json()
-        is_flagged = any(item["isFlagged"] for item in result.get("categoriesAnalysis", []))
-
-        return {"is_flagged": is_flagged, "details": result}
-
-    except Exception as e:
-        logging.error(f"Error en check_content_safety: {str(e)}")
-        return {"is_flagged": True, "details": f"Excepción: {str(e)}"}
-
 # 🔹 **Función para validar el prompt**
 @app.function_name(name="validatePrompt")
 @app.route(route="validatePrompt", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def validate_prompt(req: func.HttpRequest) -> func.HttpResponse:
+async def validate_prompt(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('validatePrompt function processed a request.')
-
-    try:
-        req_body = req.get_json()
-        prompt = req_body.get('prompt')
-        if not prompt:
-            return func.HttpResponse(json.dumps({"error": "El prompt es requerido"}), mimetype="application/json", status_code=400)
-
-        # Validar seguridad del contenido
-        safety_result = check_content_safety(prompt)
-        if safety_result['is_flagged']:
-            return func.HttpResponse(
-                json.dumps({"error": "El contenido ha sido marcado como inapropiado", "details": safety_result['details']}), 
-                mimetype="application/json", 
-                status_code=400
-            )
-
-        return func.HttpResponse(json.dumps({"message": "Prompt validado correctamente"}), mimetype="application/json")
-
-    except Exception as e:
-        logging.error(f"Error en validatePrompt: {str(e)}")
-        return func.HttpResponse(json.dumps({"error": "Error al procesar el prompt", "details": str(e)}), mimetype="application/json", status_code=500)
+    return await handle_validate(req)
 
 # 🔹 **Función para generar respuesta con OpenAI**
 @app.function_name(name="generateResponse")
 @app.route(route="generateResponse", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def generate_response(req: func.HttpRequest) -> func.HttpResponse:
+async def generate_response(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('generateResponse function processed a request.')
+    return await handle_generate(req)
+
+# 🔹 **Función para validar y generar respuesta en una sola invocación**
+@app.function_name(name="validateAndGenerate")
+@app.route(route="validateAndGenerate", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
+async def validate_and_generate(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info('validateAndGenerate function processed a request.')
+    return await handle_validate_and_generate(req)
+
+# 🔹 **Función para generar respuesta en streaming (SSE)**
+if StreamingResponse is not None:
+    @app.function_name(name="generateResponseStream")
+    @app.route(route="generateResponseStream", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
+    async def generate_response_stream(req: Request) -> StreamingResponse:
+        logging.info('generateResponseStream function processed a request.')
+
+        try:
+            req_body = await req.json()
+            prompt = req_body.get("prompt")
+        except Exception:
+            prompt = None
+
+        if not prompt:
+            return JSONResponse({"error": "Falta el prompt en la solicitud"}, status_code=400)
+
+        return StreamingResponse(
+            stream_completion(prompt, model_router.route(prompt)[0].deployment),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"}
+        )
+else:
+    logging.warning("azurefunctions-extensions-http-fastapi no está instalado: generateResponseStream deshabilitado")
+
+# 🔹 **Función para procesar el prompt completo (análisis, reescritura y seguridad)**
+@app.function_name(name="processPrompt")
+@app.route(route="processPrompt", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
+async def process_prompt(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info('processPrompt function processed a request.')
 
     try:
-        req_body = req.get_json()
-        prompt = req_body.get("prompt")
+        with stage("parse"):
+            req_body = req.get_json()
+            prompt = req_body.get("prompt")
 
         if not prompt:
             return func.HttpResponse(
-                json.dumps({"error": "Falta el prompt en la solicitud"}), 
-                status_code=400, 
+                json.dumps({"error": "El prompt es requerido"}),
+                status_code=400,
                 mimetype="application/json"
             )
 
-        # Generar respuesta con OpenAI
-        response = openai.ChatCompletion.create(
-            model="gpt-4",  # Cambia el modelo si es necesario
-            messages=[{"role": "user", "content": prompt}]
-        )
+        try:
+            response_data = await run_pipeline(prompt)
+        except PromptTooLong as e:
+            return func.HttpResponse(
+                json.dumps({"error": "El prompt es demasiado largo", "details": str(e)}),
+                status_code=413,
+                mimetype="application/json"
+            )
 
+        with stage("serialize"):
+            body = json.dumps(response_data)
         return func.HttpResponse(
-            json.dumps({"response": response["choices"][0]["message"]["content"]}),
+            body,
             status_code=200,
             mimetype="application/json"
         )
 
     except Exception as e:
-        logging.error(f"Error en generateResponse: {str(e)}")
+        logging.error(f"Error en processPrompt: {str(e)}")
         return func.HttpResponse(
-            json.dumps({"error": "Error en la generación de respuesta", "details": str(e)}), 
-            status_code=500, 
+            json.dumps({"error": "Error al procesar el prompt", "details": str(e)}),
+            status_code=500,
             mimetype="application/json"
         )
+
+# 🔹 **Función para validar lotes de prompts desde una cola**
+# Los productores encolan en `prompts-to-validate` en vez de mantener conexiones HTTP abiertas;
+# el runtime desencola en lotes (`queues.batchSize` en host.json) y los resultados salen por `prompt-verdicts`.
+@app.function_name(name="validatePromptQueue")
+@app.queue_trigger(arg_name="msg", queue_name="prompts-to-validate", connection="AzureWebJobsStorage")
+@app.queue_output(arg_name="results", queue_name="prompt-verdicts", connection="AzureWebJobsStorage")
+async def validate_prompt_queue(msg: func.QueueMessage, results: func.Out[typing.List[str]]) -> None:
+    logging.info(f'validatePromptQueue function processed message {msg.id} (intento {msg.dequeue_count}).')
+
+    try:
+        batch_id, items = parse_message(msg.get_body().decode("utf-8"))
+    except ValueError as e:
+        # Un mensaje mal formado no se reintenta: se informa y se descarta
+        logging.error(f"Mensaje inválido en validatePromptQueue: {str(e)}")
+        results.set([json.dumps({"messageId": msg.id, "error": "Mensaje inválido", "details": str(e)})])
+        return
+
+    # Si Content Safety no respondió, `validate_batch` lanza `BatchUnavailable` y el runtime reintenta el mensaje
+    verdicts = await validate_batch(batch_id or msg.id, items)
+    results.set([json.dumps(verdict, ensure_ascii=False) for verdict in verdicts])
+
+# 🔹 **Precalentamiento de clientes al iniciar una instancia nueva**
+@app.function_name(name="warmup")
+@app.warm_up_trigger("warmup")
+async def warmup(warmup) -> None:
+    logging.info('warmup function processed a request.')
+    await registry.warmup_async()
+
+# 🔹 **Función de métricas internas**
+@app.function_name(name="metrics")
+@app.route(route="metrics", methods=["GET"], auth_level=func.AuthLevel.FUNCTION)
+def metrics(req: func.HttpRequest) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({
+            "httpPool": registry.http_stats(),
+            "verdictCache": verdict_cache.stats(),
+            "responseCache": response_cache.stats(),
+            "prefilter": prefilter.stats() if prefilter else None,
+            "pii": pii_detector.stats() if pii_detector else None,
+            "rateLimiter": rate_limiter.stats(),
+            "modelRouting": model_router.stats(),
+            "speculativeGeneration": speculation_stats(),
+            "singleFlight": single_flight_stats(),
+            "circuitBreakers": circuit_breaker_stats(),
+            "languageBatching": language_batcher.stats(),
+            "contentSafetyHedging": hedger.stats() if hedger else None,
+            "latency": stage_metrics.snapshot()
+        }),
+        status_code=200,
+        mimetype="application/json"
+    )
@@ -0,0 +1,3 @@
+"""
+Código compartido por las funciones de PromptGuard (clientes, pools y utilidades).
+"""
@@ -0,0 +1,88 @@
+"""
+Validación por lotes para la función disparada por cola (`validatePromptQueue`).
+
+Un mensaje puede traer un prompt o un lote:
+    {"id": "a1", "prompt": "..."}
+    {"batchId": "b7", "prompts": [{"id": "a1", "prompt": "..."}, "texto sin id", ...]}
+
+Cada prompt se valida con `check_content_safety_async` (pre-filtro, caché,
+coalescencia, circuit breaker) con como mucho `QUEUE_BATCH_CONCURRENCY`
+llamadas simultáneas en todo el worker (el runtime procesa varios mensajes a
+la vez), y el resultado de cada uno es un mensaje de salida
+`{"batchId", "id", "is_flagged", "details"}`. Un elemento del lote que no es
+texto (ni `{"prompt": texto}`) produce su propio `{"batchId", "id", "error"}`.
+
+Si Content Safety no responde para algún prompt (error transitorio, circuito
+abierto), `validate_batch` lanza `BatchUnavailable` en lugar de emitir un
+veredicto: el runtime reintenta el mensaje y, agotados los intentos, lo mueve
+a la cola de mensajes dudosos (poison). Los prompts que sí se validaron quedan
+en la caché de veredictos y no se vuelven a pagar en el reintento.
+"""
+import asyncio
+import json
+import os
+
+from shared_code.content_safety import check_content_safety_async
+
+QUEUE_BATCH_CONCURRENCY = int(os.getenv("QUEUE_BATCH_CONCURRENCY", "16"))
+
+# Compartido por todos los mensajes que el worker procesa a la vez
+_semaphore = asyncio.Semaphore(QUEUE_BATCH_CONCURRENCY)
+
+
+class BatchUnavailable(Exception):
+    """
+    Content Safety no respondió para algún prompt del lote: el mensaje debe reintentarse.
+    """
+
+    def __init__(self, batch_id, failed, total):
+        super().__init__(f"Content Safety no respondió para {failed} de {total} prompts del lote '{batch_id}'")
+        self.batch_id = batch_id
+        self.failed = failed
+
+
+def parse_message(body):
+    """
+    Devuelve `(batch_id, [(id, prompt), ...])` a partir del cuerpo JSON del mensaje.
+    Lanza `ValueError` si el mensaje no tiene la forma esperada.
+    """
+    data = json.loads(body)
+    if isinstance(data, dict) and "prompts" in data:
+        batch_id = data.get("batchId")
+        entries = data["prompts"]
+        if not isinstance(entries, list):
+            raise ValueError("'prompts' debe ser una lista")
+    elif isinstance(data, dict) and "prompt" in data:
+        batch_id = data.get("batchId")
+        entries = [data]
+    else:
+        raise ValueError("El mensaje debe tener 'prompt' o 'prompts'")
+
+    items = []
+    for index, entry in enumerate(entries):
+        if isinstance(entry, dict):
+            items.append((str(entry.get("id", index)), entry.get("prompt")))
+        else:
+            items.append((str(index), entry))
+    return batch_id, items
+
+
+async def validate_batch(batch_id, items):
+    """
+    Valida los prompts del lote con concurrencia acotada; devuelve un resultado por prompt, en orden.
+    Lanza `BatchUnavailable` si alguno no tuvo respuesta de Content Safety.
+    """
+    async def one(item_id, prompt):
+        if not prompt:
+            return {"batchId": batch_id, "id": item_id, "error": "El prompt es requerido"}
+        if not isinstance(prompt, str):
+            return {"batchId": batch_id, "id": item_id, "error": "El prompt debe ser texto"}
+        async with _semaphore:
+            result = await check_content_safety_async(prompt)
+        return {"batchId": batch_id, "id": item_id, **result}
+
+    verdicts = await asyncio.gather(*(one(item_id, prompt) for item_id, prompt in items))
+    failed = sum(1 for verdict in verdicts if verdict.get("unavailable"))
+    if failed:
+        raise BatchUnavailable(batch_id, failed, len(verdicts))
+    return verdicts
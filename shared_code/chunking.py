@@ -0,0 +1,82 @@
+"""
+División de textos largos en fragmentos para Content Safety.
+
+El texto se corta en límites de oración y los fragmentos se arman con
+oraciones completas hasta `max_chars`. Cada fragmento repite el final del
+anterior (`overlap` caracteres, en oraciones enteras si se puede), así un
+contenido que cae justo en el corte se analiza completo en alguno de los dos.
+"""
+import re
+
+# Fin de oración (con comillas o paréntesis de cierre) seguido de espacio, o salto de línea
+_BOUNDARY = re.compile(r"[.!?…。！？]+[\"'”»)\]]*\s+|\n\s*")
+
+
+def split_sentences(text):
+    """
+    Oraciones de `text` con su espacio final; concatenadas devuelven el texto original.
+    """
+    sentences = []
+    start = 0
+    for match in _BOUNDARY.finditer(text):
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    if start < len(text):
+        sentences.append(text[start:])
+    return sentences
+
+
+def _hard_split(sentence, size):
+    # Una "oración" más larga que el fragmento se corta en el último espacio de cada ventana
+    pieces = []
+    while len(sentence) > size:
+        cut = sentence.rfind(" ", size // 2, size) + 1 or size
+        pieces.append(sentence[:cut])
+        sentence = sentence[cut:]
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def _overlap_tail(sentences, chunk, overlap):
+    tail = []
+    size = 0
+    for sentence in reversed(sentences):
+        if size + len(sentence) > overlap:
+            break
+        tail.insert(0, sentence)
+        size += len(sentence)
+    if not tail and overlap:
+        # La última oración es más larga que el solapamiento: se toman sus últimas palabras
+        text = chunk[-overlap:]
+        space = text.find(" ")
+        tail = [text[space + 1:] if 0 <= space < len(text) - 1 else text]
+    return tail
+
+
+def chunk_text(text, max_chars, overlap=0):
+    """
+    Divide `text` en fragmentos de hasta `max_chars` caracteres que se solapan en `overlap`.
+    """
+    if len(text) <= max_chars:
+        return [text]
+    overlap = min(overlap, max_chars // 2)
+
+    sentences = []
+    for sentence in split_sentences(text):
+        sentences.extend(_hard_split(sentence, max_chars - overlap))
+
+    chunks = []
+    current = []
+    size = 0
+    for sentence in sentences:
+        if current and size + len(sentence) > max_chars:
+            chunks.append("".join(current))
+            current = _overlap_tail(current, chunks[-1], overlap)
+            size = sum(len(s) for s in current)
+        current.append(sentence)
+        size += len(sentence)
+    if current:
+        chunks.append("".join(current))
+
+    return [chunk for chunk in chunks if chunk.strip()]
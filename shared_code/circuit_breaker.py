@@ -0,0 +1,235 @@
+"""
+Circuit breaker por servicio upstream.
+
+Cada servicio (`contentSafety`, `openai`, `language`, ...) tiene una ventana con el resultado de sus últimas llamadas. Si
+en la ventana la tasa de errores (excepciones, 5xx o 429) o la de llamadas
+lentas supera el umbral, el circuito se abre y durante `open_seconds` las
+llamadas fallan al instante con `CircuitOpen`, sin tocar la red. Después pasa
+a semiabierto: deja pasar unas pocas llamadas de prueba y, si todas salen
+bien, se cierra; si alguna falla, vuelve a abrirse.
+
+Los circuitos se identifican por el nombre del servicio, no por la URL del
+endpoint: el nombre aparece en `CircuitOpen` y en `/metrics`, y no debe
+exponer los nombres de los recursos de Azure.
+
+Variables de entorno (valen para todos los servicios):
+- `CIRCUIT_BREAKER_WINDOW` / `CIRCUIT_BREAKER_MIN_CALLS`: tamaño de la ventana y mínimo de llamadas para evaluarla (20 / 10).
+- `CIRCUIT_BREAKER_ERROR_RATE`: tasa de errores que abre el circuito (0.5).
+- `CIRCUIT_BREAKER_SLOW_MS` / `CIRCUIT_BREAKER_SLOW_RATE`: una llamada es lenta si supera esos ms; tasa de lentas que abre el circuito (5000 / 0.8).
+- `CIRCUIT_BREAKER_OPEN_SECONDS`: tiempo abierto antes de probar de nuevo (30).
+- `CIRCUIT_BREAKER_HALF_OPEN_CALLS`: llamadas de prueba en semiabierto (3).
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """
+    El circuito del servicio está abierto: la llamada no se hizo.
+    """
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuito abierto para '{name}', reintentar en {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(status_code):
+    """
+    Respuestas que cuentan como falla del servicio (no del cliente).
+    """
+    return status_code >= 500 or status_code == 429
+
+
+def _exception_is_failure(error):
+    # Los SDK lanzan excepciones con `status_code` para las respuestas de error;
+    # un 400 (p. ej. el filtro de contenido de OpenAI) no es culpa del servicio
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or is_upstream_failure(status_code)
+
+
+class CircuitBreaker:
+    """
+    Estados cerrado / abierto / semiabierto con umbrales de errores y de latencia.
+    """
+
+    def __init__(self, name, window=20, min_calls=10, error_rate=0.5, slow_call_ms=5000.0, slow_rate=0.8,
+                 open_seconds=30.0, half_open_calls=3):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_ms = slow_call_ms
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._window = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    @classmethod
+    def from_env(cls, name, slow_call_ms=None):
+        return cls(
+            name,
+            window=int(os.getenv("CIRCUIT_BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "10")),
+            error_rate=float(os.getenv("CIRCUIT_BREAKER_ERROR_RATE", "0.5")),
+            slow_call_ms=slow_call_ms or float(os.getenv("CIRCUIT_BREAKER_SLOW_MS", "5000")),
+            slow_rate=float(os.getenv("CIRCUIT_BREAKER_SLOW_RATE", "0.8")),
+            open_seconds=float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", "30")),
+            half_open_calls=int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_CALLS", "3")),
+        )
+
+    def _try_acquire(self):
+        """
+        Devuelve 0 si la llamada puede hacerse, o los segundos que faltan para volver a probar.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    return remaining
+                self.state = HALF_OPEN
+                self._trials = 0
+                self._trial_successes = 0
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    return self.open_seconds / 10
+                self._trials += 1
+            return 0.0
+
+    def acquire(self, max_wait=0.0):
+        """
+        Permite la llamada o lanza `CircuitOpen`; con `max_wait` espera a que el circuito vuelva a probar.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            retry_after = self._try_acquire()
+            if not retry_after:
+                return
+            if time.monotonic() + retry_after > deadline:
+                self.rejected += 1
+                raise CircuitOpen(self.name, retry_after)
+            time.sleep(retry_after)
+
+    async def acquire_async(self, max_wait=0.0):
+        deadline = time.monotonic() + max_wait
+        while True:
+            retry_after = self._try_acquire()
+            if not retry_after:
+                return
+            if time.monotonic() + retry_after > deadline:
+                self.rejected += 1
+                raise CircuitOpen(self.name, retry_after)
+            await asyncio.sleep(retry_after)
+
+    def record(self, failed, seconds):
+        slow = seconds * 1000 > self.slow_call_ms
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self.state = CLOSED
+                        self._window.clear()
+                return
+            if self.state == OPEN:
+                return
+
+            self._window.append((failed, slow))
+            calls = len(self._window)
+            if calls >= self.min_calls:
+                failures = sum(1 for f, _ in self._window if f)
+                slow_calls = sum(1 for _, s in self._window if s)
+                if failures / calls >= self.error_rate or slow_calls / calls >= self.slow_rate:
+                    self._open()
+
+    def release(self):
+        """
+        Libera el lugar de prueba de una llamada que se canceló sin resultado.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def _open(self):
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._window.clear()
+
+    def call(self, fn, max_wait=0.0):
+        """
+        Ejecuta `fn()` (que devuelve una respuesta HTTP) bajo el circuito.
+        """
+        self.acquire(max_wait)
+        start = time.perf_counter()
+        try:
+            response = fn()
+        except Exception as e:
+            self.record(_exception_is_failure(e), time.perf_counter() - start)
+            raise
+        self.record(is_upstream_failure(response.status_code), time.perf_counter() - start)
+        return response
+
+    async def call_async(self, factory, max_wait=0.0):
+        """
+        Versión asíncrona de `call`: `factory()` devuelve la corrutina de la llamada.
+        """
+        await self.acquire_async(max_wait)
+        start = time.perf_counter()
+        try:
+            response = await factory()
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        except Exception as e:
+            self.record(_exception_is_failure(e), time.perf_counter() - start)
+            raise
+        self.record(is_upstream_failure(response.status_code), time.perf_counter() - start)
+        return response
+
+    def stats(self):
+        with self._lock:
+            calls = len(self._window)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "window_error_rate": round(sum(1 for f, _ in self._window if f) / calls, 4) if calls else 0.0,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(name, slow_call_ms=None):
+    """
+    Circuit breaker del servicio `name`, creado la primera vez con la configuración de entorno.
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker.from_env(name, slow_call_ms)
+    return breaker
+
+
+def circuit_breaker_stats():
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
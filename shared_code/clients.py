@@ -0,0 +1,219 @@
+"""
+Registro de clientes de los servicios de Azure, compartido por todas las etapas.
+
+Cada cliente se crea una sola vez por proceso del worker, la primera vez que
+se pide, y se reutiliza en todas las invocaciones: así no se vuelven a leer
+credenciales, armar el transporte ni abrir un pool de conexiones nuevo por
+solicitud.
+
+- `session()`: sesión HTTP síncrona con pool keep-alive (`shared_code.http_pool`).
+- `http()` / `openai_async()`: clientes asíncronos (httpx y OpenAI) de los handlers `async def`.
+- `text_analytics()`, `content_safety()`, `openai()`: clientes de los SDK síncronos.
+
+httpcore recorre todas las conexiones del pool en cada solicitud, con un costo
+que crece de forma cuadrática en pools grandes. Por eso las conexiones
+asíncronas se reparten en varios clientes pequeños ("shards") usados en round-robin.
+"""
+import asyncio
+import atexit
+import itertools
+import logging
+import math
+import os
+import threading
+
+from shared_code.http_pool import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, PooledSession, max_concurrent_requests
+
+OPENAI_API_VERSION = os.getenv("OPENAI_API_VERSION", "2024-12-01-preview")
+SHARD_SIZE = int(os.getenv("ASYNC_HTTP_SHARD_SIZE", "16"))
+
+
+class ClientRegistry:
+    """
+    Crea los clientes de forma perezosa y los guarda para el resto de la vida del proceso.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.RLock()
+        self._next_shard = itertools.count()
+
+    def _get(self, name, factory):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = factory()
+                    self._clients[name] = client
+                    logging.info(f"Cliente '{name}' creado")
+        return client
+
+    def _pool_size(self):
+        return int(os.getenv("HTTP_POOL_SIZE", "0")) or max_concurrent_requests()
+
+    # --- Clientes HTTP ---
+
+    def session(self):
+        return self._get("session", PooledSession)
+
+    def _build_http_shards(self):
+        import httpx
+
+        shards = max(1, math.ceil(self._pool_size() / SHARD_SIZE))
+        timeout = httpx.Timeout(
+            float(os.getenv("HTTP_READ_TIMEOUT", DEFAULT_READ_TIMEOUT)),
+            connect=float(os.getenv("HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+        )
+        limits = httpx.Limits(max_connections=SHARD_SIZE, max_keepalive_connections=SHARD_SIZE)
+        return [httpx.AsyncClient(limits=limits, timeout=timeout) for _ in range(shards)]
+
+    def http(self):
+        """
+        Devuelve uno de los `httpx.AsyncClient` compartidos (round-robin entre shards).
+        """
+        shards = self._get("http", self._build_http_shards)
+        return shards[next(self._next_shard) % len(shards)]
+
+    def http_stats(self):
+        """
+        Estado de los shards de httpx que usan los handlers asíncronos (sin crearlos si
+        todavía no se pidieron): conexiones abiertas, ociosas y en uso.
+        """
+        shards = self._clients.get("http") or []
+        connections = idle = 0
+        for client in shards:
+            pool = getattr(client._transport, "_pool", None)
+            for connection in list(getattr(pool, "connections", [])):
+                connections += 1
+                idle += 1 if connection.is_idle() else 0
+        return {
+            "shards": len(shards),
+            "pool_size": len(shards) * SHARD_SIZE,
+            "connections": connections,
+            "idle": idle,
+            "in_use": connections - idle,
+        }
+
+    def _build_openai_async(self):
+        from openai import AsyncAzureOpenAI, AsyncOpenAI
+
+        shards = self._get("http", self._build_http_shards)
+        endpoint = os.getenv("OPENAI_ENDPOINT")
+        if endpoint:
+            return [
+                AsyncAzureOpenAI(
+                    azure_endpoint=endpoint,
+                    api_key=os.getenv("OPENAI_KEY"),
+                    api_version=OPENAI_API_VERSION,
+                    http_client=http_client,
+                )
+                for http_client in shards
+            ]
+        return [AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client) for http_client in shards]
+
+    def openai_async(self):
+        """
+        Cliente asíncrono de OpenAI: Azure OpenAI si hay `OPENAI_ENDPOINT`, OpenAI
+        directo con `OPENAI_API_KEY` en caso contrario. Hay uno por shard de httpx.
+        """
+        clients = self._get("openai_async", self._build_openai_async)
+        return clients[next(self._next_shard) % len(clients)]
+
+    # --- Clientes de los SDK de Azure ---
+
+    def text_analytics(self):
+        def factory():
+            from azure.ai.textanalytics import TextAnalyticsClient
+            from azure.core.credentials import AzureKeyCredential
+
+            return TextAnalyticsClient(
+                endpoint=os.getenv("LANGUAGE_ENDPOINT"),
+                credential=AzureKeyCredential(os.getenv("LANGUAGE_KEY")),
+            )
+
+        return self._get("text_analytics", factory)
+
+    def content_safety(self):
+        def factory():
+            from azure.ai.contentsafety import ContentSafetyClient
+            from azure.core.credentials import AzureKeyCredential
+
+            return ContentSafetyClient(
+                os.getenv("CONTENT_SAFETY_ENDPOINT"), AzureKeyCredential(os.getenv("CONTENT_SAFETY_KEY"))
+            )
+
+        return self._get("content_safety", factory)
+
+    def openai(self):
+        def factory():
+            from openai import AzureOpenAI
+
+            return AzureOpenAI(
+                azure_endpoint=os.getenv("OPENAI_ENDPOINT"),
+                api_key=os.getenv("OPENAI_KEY"),
+                api_version=OPENAI_API_VERSION,
+            )
+
+        return self._get("openai", factory)
+
+    # --- Ciclo de vida ---
+
+    def warmup(self):
+        """
+        Crea por adelantado los clientes cuyos servicios están configurados.
+        """
+        self.session()
+        self._get("http", self._build_http_shards)
+        if os.getenv("OPENAI_ENDPOINT") or os.getenv("OPENAI_API_KEY"):
+            self._get("openai_async", self._build_openai_async)
+        if os.getenv("LANGUAGE_ENDPOINT") and os.getenv("LANGUAGE_KEY"):
+            self.text_analytics()
+        if os.getenv("CONTENT_SAFETY_ENDPOINT") and os.getenv("CONTENT_SAFETY_KEY"):
+            self.content_safety()
+
+    async def warmup_async(self):
+        """
+        Igual que `warmup`, y además abre una conexión por shard hacia cada endpoint
+        configurado para que la primera solicitud real no pague el handshake.
+        """
+        self.warmup()
+        endpoints = [
+            os.getenv(name) for name in ("CONTENT_SAFETY_ENDPOINT", "LANGUAGE_ENDPOINT", "OPENAI_ENDPOINT")
+        ]
+        shards = self._clients["http"]
+
+        async def connect(client, endpoint):
+            try:
+                await client.head(endpoint)
+            except Exception as e:
+                logging.warning(f"No se pudo precalentar la conexión a {endpoint}: {str(e)}")
+
+        await asyncio.gather(*(connect(client, endpoint) for client in shards for endpoint in endpoints if endpoint))
+
+    def close(self):
+        """
+        Cierra los clientes síncronos. Los asíncronos se cierran con `aclose()`.
+        """
+        with self._lock:
+            for name in ("session", "text_analytics", "content_safety", "openai"):
+                client = self._clients.pop(name, None)
+                if client is not None:
+                    try:
+                        client.close()
+                    except Exception as e:
+                        logging.warning(f"Error al cerrar el cliente '{name}': {str(e)}")
+
+    async def aclose(self):
+        self.close()
+        with self._lock:
+            openai_clients = self._clients.pop("openai_async", [])
+            shards = self._clients.pop("http", [])
+        for client in openai_clients:
+            await client.close()
+        for client in shards:
+            await client.aclose()
+
+
+registry = ClientRegistry()
+atexit.register(registry.close)
@@ -0,0 +1,75 @@
+"""
+Llamadas a chat completions de Azure OpenAI con control de admisión.
+
+Todas las llamadas al modelo (respuesta, reescritura y streaming) pasan por
+acá: se reserva el cupo estimado en el limitador de la implementación, se
+hace la llamada pidiendo la respuesta cruda para leer los headers de cuota,
+y si el servicio responde 429 se pausa la implementación el tiempo indicado.
+
+Las llamadas sin streaming con los mismos mensajes (exactos) y parámetros
+que llegan a la vez comparten una sola llamada al servicio y un solo descuento
+de cuota.
+"""
+import json
+import logging
+import os
+
+from shared_code.circuit_breaker import breaker_for
+from shared_code.clients import registry
+from shared_code.rate_limiter import estimate_tokens, rate_limiter
+from shared_code.singleflight import SingleFlight
+from shared_code.telemetry import stage
+from shared_code.verdict_cache import exact_key
+
+_inflight = SingleFlight("openai")
+
+# Una generación tarda varios segundos: sólo cuenta como lenta pasado este umbral
+OPENAI_SLOW_CALL_MS = float(os.getenv("OPENAI_SLOW_CALL_MS", "60000"))
+
+
+async def create_chat_completion(model, messages, **kwargs):
+    """
+    Equivalente a `chat.completions.create` que respeta la cuota TPM/RPM de `model`.
+    Lanza `RateLimitExceeded` si no hay cupo dentro de la espera máxima y
+    `CircuitOpen` si el circuito del endpoint está abierto.
+    """
+    if kwargs.get("stream"):
+        return await _create(model, messages, **kwargs)
+    # Clave exacta: mensajes que difieren en mayúsculas o indentación pueden tener respuestas distintas
+    key = exact_key(json.dumps(messages, ensure_ascii=False, sort_keys=True), model, json.dumps(kwargs, sort_keys=True))
+    return await _inflight.do(key, lambda: _create(model, messages, **kwargs))
+
+
+async def _create(model, messages, **kwargs):
+    import openai
+
+    limiter = rate_limiter.for_deployment(model)
+    with stage("rateLimitWait", deployment=model):
+        await limiter.acquire(estimate_tokens(messages, kwargs.get("max_tokens"), model))
+
+    try:
+        # Con stream=True mide hasta los headers, no hasta el último token
+        with stage("openai", deployment=model):
+            breaker = breaker_for("openai", OPENAI_SLOW_CALL_MS)
+            raw = await breaker.call_async(lambda: registry.openai_async().chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                **kwargs
+            ))
+    except openai.RateLimitError as e:
+        retry_after = _retry_after(e.response.headers)
+        logging.error(f"Cuota de '{model}' excedida, pausando {retry_after:.1f}s")
+        limiter.throttle(retry_after)
+        raise
+
+    limiter.update_from_headers(raw.headers)
+    return raw.parse()
+
+
+def _retry_after(headers):
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[name]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return 10.0
@@ -0,0 +1,282 @@
+"""
+Verificación de prompts con Azure Content Safety (`text:analyze`).
+
+Los prompts largos se dividen en fragmentos (`CONTENT_SAFETY_CHUNK_CHARS`,
+como mucho el límite de 10K caracteres por solicitud del servicio) que se
+analizan en paralelo. La severidad de cada categoría es la máxima entre los
+fragmentos y, apenas uno queda marcado, se cancelan los que faltan.
+
+Un texto se marca si alguna categoría llega a `CONTENT_SAFETY_SEVERITY_THRESHOLD`
+(por defecto 4, "medio", el mismo umbral del filtro por defecto de Azure
+OpenAI) o si coincide con alguna lista de bloqueo.
+
+Si el circuit breaker del endpoint está abierto, no se llama a Azure y se
+aplica `CONTENT_SAFETY_FALLBACK`:
+- `reject` (por defecto): se marca el prompt, igual que ante un error de la API.
+- `prefilter`: decide sólo el pre-filtro local; los dudosos con términos sensibles se marcan.
+- `queue`: se espera hasta `CONTENT_SAFETY_QUEUE_WAIT` segundos a que el circuito vuelva a probar.
+
+Los veredictos que no vienen de una respuesta del servicio (error de la API,
+excepción, credenciales faltantes, circuito abierto) llevan `"unavailable": True`,
+para que quien pueda reintentar (p. ej. la cola) no los tome como definitivos.
+
+Con `CONTENT_SAFETY_HEDGING=true`, la versión asíncrona duplica las llamadas
+que tardan más que el p95 reciente (ver `shared_code.hedging`), hacia
+`CONTENT_SAFETY_SECONDARY_ENDPOINT` si está configurado o al mismo endpoint.
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+
+from shared_code.chunking import chunk_text
+from shared_code.circuit_breaker import CircuitOpen, breaker_for, is_upstream_failure
+from shared_code.clients import registry
+from shared_code.hedging import Hedger
+from shared_code.prefilter import AMBIGUOUS, REJECT, prefilter
+from shared_code.singleflight import SingleFlight
+from shared_code.telemetry import stage
+from shared_code.verdict_cache import prompt_key, verdict_cache
+
+CONTENT_SAFETY_ENDPOINT = os.getenv("CONTENT_SAFETY_ENDPOINT")
+CONTENT_SAFETY_KEY = os.getenv("CONTENT_SAFETY_KEY")
+SEVERITY_THRESHOLD = int(os.getenv("CONTENT_SAFETY_SEVERITY_THRESHOLD", "4"))
+CHUNK_CHARS = min(int(os.getenv("CONTENT_SAFETY_CHUNK_CHARS", "10000")), 10000)
+CHUNK_OVERLAP = int(os.getenv("CONTENT_SAFETY_CHUNK_OVERLAP", "200"))
+CHUNK_CONCURRENCY = int(os.getenv("CONTENT_SAFETY_CHUNK_CONCURRENCY", "8"))
+FALLBACK = os.getenv("CONTENT_SAFETY_FALLBACK", "reject").lower()
+QUEUE_WAIT = float(os.getenv("CONTENT_SAFETY_QUEUE_WAIT", "10")) if FALLBACK == "queue" else 0.0
+SECONDARY_ENDPOINT = os.getenv("CONTENT_SAFETY_SECONDARY_ENDPOINT") or CONTENT_SAFETY_ENDPOINT
+SECONDARY_KEY = os.getenv("CONTENT_SAFETY_SECONDARY_KEY") or CONTENT_SAFETY_KEY
+# Nombres de los circuit breakers; el secundario tiene el suyo sólo si es otro endpoint
+BREAKER = "contentSafety"
+SECONDARY_BREAKER = "contentSafetySecondary" if SECONDARY_ENDPOINT != CONTENT_SAFETY_ENDPOINT else BREAKER
+
+hedger = None
+if os.getenv("CONTENT_SAFETY_HEDGING", "false").lower() == "true":
+    hedger = Hedger.from_env("contentSafety", "CONTENT_SAFETY")
+
+# Prompts iguales (normalizados) que llegan a la vez comparten una sola llamada
+_inflight = SingleFlight("contentSafety")
+
+
+def _content_safety_request(prompt, endpoint=None, key=None):
+    """
+    Arma la URL, los headers y el cuerpo de la llamada a Content Safety.
+    """
+    url = f"{endpoint or CONTENT_SAFETY_ENDPOINT}/contentsafety/text:analyze?api-version=2023-10-01"
+    headers = {
+        "Content-Type": "application/json",
+        "Ocp-Apim-Subscription-Key": key or CONTENT_SAFETY_KEY
+    }
+    return url, headers, {"text": prompt}
+
+
+def _is_flagged(result):
+    return bool(result.get("blocklistsMatch")) or any(
+        (item.get("severity") or 0) >= SEVERITY_THRESHOLD for item in result.get("categoriesAnalysis", [])
+    )
+
+
+def _unavailable(details):
+    # Sin respuesta de Content Safety el prompt se marca por las dudas, pero no es un veredicto
+    return {"is_flagged": True, "details": details, "unavailable": True}
+
+
+def _content_safety_verdict(status_code, text, result):
+    if status_code != 200:
+        logging.error(f"Error en Content Safety: {text}")
+        return _unavailable(f"Error en API: {status_code}")
+
+    return {"is_flagged": _is_flagged(result), "details": result}
+
+
+def _merge_results(results, chunks):
+    """
+    Une los análisis de los fragmentos: severidad máxima por categoría y todas las coincidencias de listas.
+    """
+    if chunks == 1:
+        return results[0]
+    severities = {}
+    blocklists = []
+    for result in results:
+        for item in result.get("categoriesAnalysis", []):
+            severities[item["category"]] = max(severities.get(item["category"], 0), item.get("severity") or 0)
+        blocklists.extend(result.get("blocklistsMatch") or [])
+    return {
+        "blocklistsMatch": blocklists,
+        "categoriesAnalysis": [{"category": category, "severity": severity} for category, severity in severities.items()],
+        "chunks": {"total": chunks, "analyzed": len(results)},
+    }
+
+
+def _prefilter_verdict(prompt):
+    """
+    Veredicto del pre-filtro local, o None si el prompt es dudoso y debe ir a la API.
+    """
+    if prefilter is None:
+        return None
+    result = prefilter.classify(prompt)
+    if result["decision"] == AMBIGUOUS:
+        return None
+    return {"is_flagged": result["decision"] == REJECT, "details": {"prefilter": result}}
+
+
+def _fallback_verdict(prompt, error):
+    """
+    Veredicto sin Content Safety mientras su circuito está abierto (no se guarda en la caché).
+    """
+    # El detalle queda en el log; al cliente sólo le llega que el servicio no está disponible
+    logging.warning(f"Content Safety no disponible, fallback '{FALLBACK}': {str(error)}")
+    details = {"fallback": FALLBACK, "error": "Content Safety no disponible"}
+    if FALLBACK == "prefilter" and prefilter is not None:
+        result = prefilter.classify(prompt, record=False)
+        # Lo que el pre-filtro no aprueba por sí mismo sólo pasa si no tiene términos sensibles
+        return {"is_flagged": result["decision"] == REJECT or bool(result.get("matches")),
+                "details": {**details, "prefilter": result}, "unavailable": True}
+    return _unavailable(details)
+
+
+def _cache_verdict(prompt, verdict, result):
+    # Sólo se guardan respuestas válidas de la API; los errores se reintentan
+    if result is not None:
+        verdict_cache.put(prompt, verdict)
+    return verdict
+
+
+def _analyze(text):
+    url, headers, data = _content_safety_request(text)
+
+    # Sesión compartida: reutiliza conexiones keep-alive en vez de abrir una por llamada
+    with stage("contentSafety", **{"http.url": url}):
+        response = breaker_for(BREAKER).call(
+            lambda: registry.session().post(url, headers=headers, json=data), max_wait=QUEUE_WAIT
+        )
+    return response.status_code, response.text, response.json() if response.status_code == 200 else None
+
+
+def _post_async(text, endpoint, key, breaker):
+    url, headers, data = _content_safety_request(text, endpoint, key)
+    return breaker_for(breaker).call_async(
+        lambda: registry.http().post(url, headers=headers, json=data), max_wait=QUEUE_WAIT
+    )
+
+
+async def _analyze_async(text, semaphore=None):
+    async with semaphore or nullcontext():
+        with stage("contentSafety"):
+            if hedger is None:
+                response = await _post_async(text, CONTENT_SAFETY_ENDPOINT, CONTENT_SAFETY_KEY, BREAKER)
+            else:
+                response = await hedger.call(
+                    lambda: _post_async(text, CONTENT_SAFETY_ENDPOINT, CONTENT_SAFETY_KEY, BREAKER),
+                    lambda: _post_async(text, SECONDARY_ENDPOINT, SECONDARY_KEY, SECONDARY_BREAKER),
+                    accept=lambda response: not is_upstream_failure(response.status_code),
+                )
+    return response.status_code, response.text, response.json() if response.status_code == 200 else None
+
+
+def check_content_safety(prompt):
+    """
+    Envía el prompt a Azure Content Safety y devuelve si fue marcado como inseguro.
+    """
+    if not CONTENT_SAFETY_ENDPOINT or not CONTENT_SAFETY_KEY:
+        logging.error("Faltan las credenciales de Azure Content Safety")
+        return _unavailable("Credenciales no configuradas")
+
+    try:
+        # Los casos obvios se resuelven localmente y un prompt repetido se responde
+        # desde la caché, en ambos casos sin llamar a Azure
+        local = _prefilter_verdict(prompt)
+        if local is not None:
+            return local
+        cached = verdict_cache.get(prompt)
+        if cached is not None:
+            return cached
+
+        chunks = chunk_text(prompt, CHUNK_CHARS, CHUNK_OVERLAP)
+        if len(chunks) == 1:
+            status_code, text, result = _analyze(prompt)
+            return _cache_verdict(prompt, _content_safety_verdict(status_code, text, result), result)
+
+        results = []
+        pool = ThreadPoolExecutor(max_workers=min(len(chunks), CHUNK_CONCURRENCY))
+        try:
+            for future in as_completed([pool.submit(_analyze, chunk) for chunk in chunks]):
+                status_code, text, result = future.result()
+                if status_code != 200:
+                    return _content_safety_verdict(status_code, text, None)
+                results.append(result)
+                if _is_flagged(result):
+                    # Corte temprano: el resultado ya no puede cambiar
+                    break
+        finally:
+            # No se espera a los fragmentos en curso; los pendientes se cancelan
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        merged = _merge_results(results, len(chunks))
+        return _cache_verdict(prompt, _content_safety_verdict(200, None, merged), merged)
+
+    except CircuitOpen as e:
+        return _fallback_verdict(prompt, e)
+
+    except Exception as e:
+        logging.error(f"Error en check_content_safety: {str(e)}")
+        return _unavailable(f"Excepción: {str(e)}")
+
+
+async def check_content_safety_async(prompt):
+    """
+    Versión asíncrona de `check_content_safety`: no bloquea un hilo mientras espera a Azure.
+    """
+    if not CONTENT_SAFETY_ENDPOINT or not CONTENT_SAFETY_KEY:
+        logging.error("Faltan las credenciales de Azure Content Safety")
+        return _unavailable("Credenciales no configuradas")
+
+    try:
+        local = _prefilter_verdict(prompt)
+        if local is not None:
+            return local
+        cached = verdict_cache.get(prompt)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        logging.error(f"Error en check_content_safety_async: {str(e)}")
+        return _unavailable(f"Excepción: {str(e)}")
+
+    return await _inflight.do(prompt_key(prompt), lambda: _check_upstream_async(prompt))
+
+
+async def _check_upstream_async(prompt):
+    try:
+        chunks = chunk_text(prompt, CHUNK_CHARS, CHUNK_OVERLAP)
+        if len(chunks) == 1:
+            status_code, text, result = await _analyze_async(prompt)
+            return _cache_verdict(prompt, _content_safety_verdict(status_code, text, result), result)
+
+        semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+        tasks = [asyncio.ensure_future(_analyze_async(chunk, semaphore)) for chunk in chunks]
+        results = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                status_code, text, result = await next_done
+                if status_code != 200:
+                    return _content_safety_verdict(status_code, text, None)
+                results.append(result)
+                if _is_flagged(result):
+                    # Corte temprano: el resultado ya no puede cambiar
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        merged = _merge_results(results, len(chunks))
+        return _cache_verdict(prompt, _content_safety_verdict(200, None, merged), merged)
+
+    except CircuitOpen as e:
+        return _fallback_verdict(prompt, e)
+
+    except Exception as e:
+        logging.error(f"Error en check_content_safety_async: {str(e)}")
+        return _unavailable(f"Excepción: {str(e)}")
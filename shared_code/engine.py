@@ -0,0 +1,323 @@
+"""
+Lógica de `validatePrompt` y `generateResponse`, común a los dos modelos de programación.
+
+Los decoradores de `function_app.py` (modelo v2) y las carpetas
+`validatePrompt/` y `generateResponse/` con `function.json` (modelo v1)
+llaman a estos mismos handlers, así que las dos formas de desplegar la app
+responden igual y usan los mismos clientes, pools, cachés y limitadores: son
+objetos de módulo de `shared_code`, creados una sola vez por proceso del
+worker sin importar qué función los pide primero.
+
+`validate`, `generate` y `validate_and_generate` reciben el prompt y
+devuelven un `EngineResult` (código de estado, cuerpo JSON y encabezados);
+los `handle_*` reciben y devuelven los objetos HTTP de Azure Functions.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import typing
+
+import azure.functions as func
+
+from shared_code.circuit_breaker import CircuitOpen
+from shared_code.completions import create_chat_completion
+from shared_code.content_safety import check_content_safety_async
+from shared_code.pii import PII_ACTION, REDACT, REJECT, pii_detector, restore, summarize
+from shared_code.prefilter import REJECT as PREFILTER_REJECT, prefilter
+from shared_code.rate_limiter import RateLimitExceeded
+from shared_code.response_cache import response_cache
+from shared_code.router import model_router
+from shared_code.telemetry import stage, stage_metrics
+from shared_code.tokens import PromptTooLong, ensure_fits
+
+# `validateAndGenerate` y `generateResponse` con `"validate": true` generan en paralelo con la validación salvo que se desactive
+SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "true").lower() != "false"
+
+# Largo máximo de un prompt a validar (0 sin tope); por debajo, Content Safety lo analiza en fragmentos
+PROMPT_MAX_CHARS = int(os.getenv("PROMPT_MAX_CHARS", "50000"))
+
+# Generaciones especulativas de `generate_validated`: entregadas y descartadas (canceladas si no habían terminado)
+speculation = {"started": 0, "released": 0, "discarded": 0, "cancelled": 0}
+
+
+class EngineResult(typing.NamedTuple):
+    status_code: int
+    body: dict
+    headers: typing.Optional[dict] = None
+
+
+def _retry_after(seconds):
+    return {"Retry-After": str(max(1, round(seconds)))}
+
+
+def _check_length(prompt):
+    """
+    Devuelve el 413 para un prompt más largo que `PROMPT_MAX_CHARS`, o None.
+    """
+    if PROMPT_MAX_CHARS and len(prompt) > PROMPT_MAX_CHARS:
+        return EngineResult(413, {"error": "El prompt es demasiado largo",
+                                  "details": f"El prompt supera los {PROMPT_MAX_CHARS} caracteres"})
+    return None
+
+
+def _check_pii(prompt):
+    """
+    Busca datos personales localmente; devuelve `(prompt, pii, marcadores, rechazo)`.
+    Con `PII_ACTION=redact` el prompt devuelto es el redactado, y es el único que
+    sale del worker (a Content Safety y a OpenAI); `marcadores` es `{marcador: valor}`
+    para volver a poner los datos en la respuesta del modelo.
+    """
+    if pii_detector is None:
+        return prompt, None, None, None
+    with stage("pii"):
+        entities = pii_detector.scan(prompt)
+    if not entities:
+        return prompt, None, None, None
+    if PII_ACTION == REJECT:
+        return prompt, None, None, EngineResult(400, {"error": "El prompt contiene datos personales",
+                                                      "details": {"pii": summarize(entities)}})
+    pii = {"entities": summarize(entities)}
+    mapping = None
+    if PII_ACTION == REDACT:
+        prompt, mapping = pii_detector.redact(prompt, entities)
+        pii["redactedPrompt"] = prompt
+    return prompt, pii, mapping, None
+
+
+def _restore_pii(result, mapping):
+    """
+    Vuelve a poner los datos del usuario en lugar de los marcadores en la respuesta generada.
+    """
+    if not mapping or not result.body.get("response"):
+        return result
+    return result._replace(body={**result.body, "response": restore(result.body["response"], mapping)})
+
+
+async def _check_safety(prompt, pii=None):
+    safety_result = await check_content_safety_async(prompt)
+    if safety_result['is_flagged']:
+        return EngineResult(400, {"error": "El contenido ha sido marcado como inapropiado",
+                                  "details": safety_result['details']})
+    body = {"message": "Prompt validado correctamente"}
+    if pii:
+        body["pii"] = pii
+    return EngineResult(200, body)
+
+
+async def validate(prompt):
+    """
+    Busca datos personales localmente y valida el prompt con Content Safety
+    (pre-filtro, caché y fallback incluidos).
+    """
+    if not prompt:
+        return EngineResult(400, {"error": "El prompt es requerido"})
+
+    too_long = _check_length(prompt)
+    if too_long is not None:
+        return too_long
+    prompt, pii, _, rejection = _check_pii(prompt)
+    if rejection is not None:
+        return rejection
+    return await _check_safety(prompt, pii)
+
+
+async def _generate(prompt, model=None):
+    """
+    Devuelve `(EngineResult, entrada_de_caché)`; la entrada es `(prompt, modelo, respuesta)`
+    o None, y la guarda quien llama, así una generación especulativa descartada no queda en caché.
+    """
+    if not prompt:
+        return EngineResult(400, {"error": "Falta el prompt en la solicitud"}), None
+
+    route = None
+    headers = {}
+    if model is None:
+        route, _ = model_router.route(prompt)
+        model = route.deployment
+        headers["X-Model-Route"] = route.name
+
+    # Una pregunta igual (o casi igual) respondida hace poco se contesta sin llamar al modelo
+    cached = response_cache.get(prompt, model)
+    if cached is not None:
+        content, match = cached
+        return EngineResult(200, {"response": content}, {**headers, "X-Cache": f"HIT-{match.upper()}"}), None
+
+    messages = [{"role": "user", "content": prompt}]
+    try:
+        ensure_fits(messages, model)
+        # Generar respuesta con OpenAI sin bloquear el hilo del worker y sin pasar la cuota TPM
+        start = time.perf_counter()
+        response = await create_chat_completion(model=model, messages=messages)
+    except PromptTooLong as e:
+        return EngineResult(413, {"error": "El prompt es demasiado largo", "details": str(e)}), None
+    except RateLimitExceeded as e:
+        logging.warning(f"generateResponse descartada: {str(e)}")
+        return EngineResult(429, {"error": "Cuota de OpenAI agotada, reintente más tarde", "details": str(e)},
+                            _retry_after(e.retry_after)), None
+    except CircuitOpen as e:
+        logging.warning(f"generateResponse descartada: {str(e)}")
+        return EngineResult(503, {"error": "Servicio de OpenAI no disponible, reintente más tarde",
+                                  "details": "Circuito abierto"}, _retry_after(e.retry_after)), None
+
+    if route is not None:
+        model_router.record(route, time.perf_counter() - start, response.usage)
+
+    choice = response.choices[0]
+    # Sólo se guardan respuestas completas (no cortadas por largo ni por el filtro de contenido)
+    entry = (prompt, model, choice.message.content) if choice.finish_reason == "stop" and choice.message.content else None
+    return EngineResult(200, {"response": choice.message.content}, {**headers, "X-Cache": "MISS"}), entry
+
+
+async def generate(prompt, model=None):
+    """
+    Genera la respuesta del modelo, usando la caché de respuestas cuando se puede.
+    Sin `model`, la implementación la elige el enrutador según la complejidad del prompt.
+    """
+    result, entry = await _generate(prompt, model)
+    if entry is not None:
+        response_cache.put(*entry)
+    return result
+
+
+async def _validate_then_generate(prompt, model=None, speculative=True):
+    """
+    Devuelve `(veredicto, resultado)`; el resultado es None si la validación no pasó.
+
+    Los datos personales y el pre-filtro se revisan antes de todo, porque son
+    locales y tardan microsegundos: un prompt rechazado por ellos nunca llega a
+    OpenAI, y con `PII_ACTION=redact` el modelo recibe el texto redactado (los
+    datos se vuelven a poner en la respuesta antes de entregarla).
+
+    Con `speculative`, la generación arranca mientras Content Safety analiza el
+    prompt. Si el prompt se marca, la generación se cancela (o se descarta si
+    ya terminó); la respuesta sólo se entrega, y se guarda en caché, después de
+    que la validación pasa. En el camino habitual la latencia es la mayor de
+    las dos en lugar de la suma.
+    """
+    too_long = _check_length(prompt)
+    if too_long is not None:
+        return too_long, None
+    prompt, pii, mapping, rejection = _check_pii(prompt)
+    if rejection is not None:
+        return rejection, None
+
+    # Sin registrar: `check_content_safety_async` vuelve a clasificarlo y lo cuenta
+    blocked = prefilter is not None and prefilter.classify(prompt, record=False)["decision"] == PREFILTER_REJECT
+    if not speculative or blocked:
+        verdict = await _check_safety(prompt, pii)
+        if verdict.status_code != 200:
+            return verdict, None
+        return verdict, _restore_pii(await generate(prompt, model), mapping)
+
+    async def speculative_generation():
+        return await _generate(prompt, model), time.perf_counter()
+
+    speculation["started"] += 1
+    start = time.perf_counter()
+    generation = asyncio.ensure_future(speculative_generation())
+    # Si se descarta después de fallar, que el error no quede sin leer
+    generation.add_done_callback(lambda task: task.cancelled() or task.exception())
+    try:
+        verdict = await _check_safety(prompt, pii)
+    except BaseException:
+        generation.cancel()
+        raise
+    validated = time.perf_counter()
+
+    if verdict.status_code != 200:
+        speculation["discarded"] += 1
+        if not generation.done():
+            speculation["cancelled"] += 1
+        generation.cancel()
+        return verdict, None
+
+    (result, entry), generated = await generation
+    # Lo que se ahorra frente a validar y después generar: la más corta de las dos etapas
+    stage_metrics.record("speculationSaved", min(validated, generated) - start)
+    speculation["released"] += 1
+    if entry is not None:
+        response_cache.put(*entry)
+    return verdict, _restore_pii(result, mapping)
+
+
+async def generate_validated(prompt, model=None):
+    """
+    `generate` con la validación de `validate` en la misma invocación (en paralelo
+    salvo con `SPECULATIVE_GENERATION=false`). Si la validación no pasa devuelve su resultado tal cual.
+    """
+    if not prompt:
+        return await validate(prompt)
+
+    verdict, result = await _validate_then_generate(prompt, model, SPECULATIVE_GENERATION)
+    if result is None:
+        return verdict
+    return EngineResult(result.status_code, {**result.body, "validation": verdict.body},
+                        {**(result.headers or {}), "X-Validation": "passed"})
+
+
+async def validate_and_generate(prompt, model=None, speculative=None):
+    """
+    Veredicto y respuesta en un solo resultado: `{"verdict": {...}, "response": ...}`.
+    `response` es None si el prompt no pasa la validación.
+    """
+    if not prompt:
+        return EngineResult(400, {"error": "El prompt es requerido"})
+    if speculative is None:
+        speculative = SPECULATIVE_GENERATION
+
+    verdict, result = await _validate_then_generate(prompt, model, speculative)
+    if result is None:
+        return EngineResult(verdict.status_code, {"verdict": {"passed": False, **verdict.body}, "response": None})
+    return EngineResult(result.status_code, {"verdict": {"passed": True, **verdict.body}, **result.body},
+                        result.headers)
+
+
+def speculation_stats():
+    return dict(speculation)
+
+
+def read_body(req: func.HttpRequest):
+    with stage("parse"):
+        return req.get_json()
+
+
+def read_prompt(req: func.HttpRequest):
+    return read_body(req).get('prompt')
+
+
+def to_http_response(result: EngineResult) -> func.HttpResponse:
+    with stage("serialize"):
+        body = json.dumps(result.body)
+    return func.HttpResponse(body, status_code=result.status_code, headers=result.headers,
+                             mimetype="application/json")
+
+
+async def handle_validate(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        return to_http_response(await validate(read_prompt(req)))
+    except Exception as e:
+        logging.error(f"Error en validatePrompt: {str(e)}")
+        return to_http_response(EngineResult(500, {"error": "Error al procesar el prompt", "details": str(e)}))
+
+
+async def handle_generate(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        body = read_body(req)
+        # Con "validate": true la validación corre junto con la generación, en la misma invocación
+        if body.get("validate"):
+            return to_http_response(await generate_validated(body.get("prompt")))
+        return to_http_response(await generate(body.get("prompt")))
+    except Exception as e:
+        logging.error(f"Error en generateResponse: {str(e)}")
+        return to_http_response(EngineResult(500, {"error": "Error en la generación de respuesta", "details": str(e)}))
+
+
+async def handle_validate_and_generate(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        body = read_body(req)
+        return to_http_response(await validate_and_generate(body.get("prompt")))
+    except Exception as e:
+        logging.error(f"Error en validateAndGenerate: {str(e)}")
+        return to_http_response(EngineResult(500, {"error": "Error al validar y generar la respuesta", "details": str(e)}))
@@ -0,0 +1,114 @@
+"""
+Solicitudes "hedged" para recortar la cola de latencia.
+
+Se lanza la llamada normal y, si no respondió cuando se cumple el umbral (el
+percentil `percentile` de las latencias recientes), se lanza un duplicado
+(al mismo endpoint o a uno secundario en otra región) y se usa la primera
+respuesta válida; la otra se cancela.
+
+Para no sobrecargar el servicio hay un presupuesto: cada llamada suma
+`budget` créditos (0.05 = como mucho un 5 % de llamadas extra) y cada
+duplicado consume uno.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+
+class Hedger:
+    """
+    Umbral adaptativo y presupuesto de duplicados de un servicio.
+    """
+
+    def __init__(self, name, percentile=95.0, budget=0.05, min_delay_ms=5.0, window=500, min_samples=20):
+        self.name = name
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay_ms / 1000
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._threshold = None
+        self._since_update = 0
+        self._credit = 0.0
+        self._max_credit = max(1.0, budget * 100)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    @classmethod
+    def from_env(cls, name, prefix):
+        return cls(
+            name,
+            percentile=float(os.getenv(f"{prefix}_HEDGE_PERCENTILE", "95")),
+            budget=float(os.getenv(f"{prefix}_HEDGE_BUDGET", "0.05")),
+            min_delay_ms=float(os.getenv(f"{prefix}_HEDGE_MIN_DELAY_MS", "5")),
+        )
+
+    def _record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._since_update += 1
+            # El percentil se recalcula cada tanto, no en cada llamada
+            if len(self._latencies) >= self.min_samples and (self._threshold is None or self._since_update >= 20):
+                ordered = sorted(self._latencies)
+                index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+                self._threshold = max(self.min_delay, ordered[index])
+                self._since_update = 0
+
+    def _take_credit(self):
+        with self._lock:
+            if self._credit < 1:
+                return False
+            self._credit -= 1
+            return True
+
+    async def call(self, primary, hedge, accept=lambda result: True):
+        """
+        Ejecuta `primary()` y, si tarda más que el umbral y hay presupuesto, también `hedge()`.
+        Devuelve el primer resultado aceptado por `accept`; si ninguno lo es, el de `primary`.
+        """
+        with self._lock:
+            self.calls += 1
+            self._credit = min(self._max_credit, self._credit + self.budget)
+            threshold = self._threshold
+
+        start = time.perf_counter()
+        first = asyncio.ensure_future(primary())
+        if threshold is not None:
+            await asyncio.wait({first}, timeout=threshold)
+        if threshold is None or first.done() or not self._take_credit():
+            try:
+                return await first
+            finally:
+                self._record(time.perf_counter() - start)
+
+        self.hedged += 1
+        second = asyncio.ensure_future(hedge())
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and accept(task.result()):
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            # Si ganó el duplicado, la latencia del primario es al menos la transcurrida
+            self._record(time.perf_counter() - start)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedged_ratio": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+                "threshold_ms": round(self._threshold * 1000, 2) if self._threshold is not None else None,
+            }
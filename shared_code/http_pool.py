@@ -0,0 +1,107 @@
+"""
+Sesión HTTP compartida con pool de conexiones keep-alive.
+
+Cada `requests.post` suelto abre una conexión TCP+TLS nueva. Esta sesión vive
+durante todo el proceso del worker y reutiliza las conexiones hacia los
+servicios de Azure, con un pool del tamaño de `maxConcurrentRequests`.
+"""
+import json
+import os
+import threading
+
+HOST_JSON_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "host.json")
+
+DEFAULT_POOL_SIZE = 100
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10.0
+
+
+def max_concurrent_requests(default=DEFAULT_POOL_SIZE):
+    """
+    Devuelve `extensions.http.maxConcurrentRequests` de host.json (o `default` si no está).
+    """
+    try:
+        with open(HOST_JSON_PATH, encoding="utf-8") as f:
+            host = json.load(f)
+        return int(host["extensions"]["http"]["maxConcurrentRequests"])
+    except (OSError, KeyError, TypeError, ValueError):
+        return default
+
+
+class PooledSession:
+    """
+    Envoltorio de `requests.Session` con pool acotado, timeouts y métricas del pool.
+
+    - `pool_size`: conexiones máximas por host (por defecto `maxConcurrentRequests`).
+    - `connect_timeout` / `read_timeout`: segundos; configurables por variables de entorno.
+    - `pool_block`: si el pool está lleno, espera una conexión libre en vez de abrir otra.
+    """
+
+    def __init__(self, pool_size=None, connect_timeout=None, read_timeout=None, pool_block=True):
+        self.pool_size = pool_size or int(os.getenv("HTTP_POOL_SIZE", "0")) or max_concurrent_requests()
+        self.timeout = (
+            connect_timeout or float(os.getenv("HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+            read_timeout or float(os.getenv("HTTP_READ_TIMEOUT", DEFAULT_READ_TIMEOUT)),
+        )
+
+        # requests tarda ~100 ms en importarse; se carga recién cuando se crea la sesión
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._adapter = HTTPAdapter(pool_connections=10, pool_maxsize=self.pool_size, pool_block=pool_block)
+        self._session = requests.Session()
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+        self._session.headers["Connection"] = "keep-alive"
+
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waits = 0
+        self._requests = 0
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            # Con todas las conexiones ocupadas esta solicitud tendrá que esperar una libre
+            if self._in_use >= self.pool_size:
+                self._waits += 1
+            self._in_use += 1
+            self._requests += 1
+        try:
+            return self._session.request(method, url, **kwargs)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def metrics(self):
+        """
+        Estado del pool: conexiones en uso, ociosas, esperas y conexiones abiertas en total.
+        """
+        idle = 0
+        opened = 0
+        manager = self._adapter.poolmanager
+        for key in list(manager.pools.keys()):
+            try:
+                pool = manager.pools[key]
+            except KeyError:
+                continue
+            opened += pool.num_connections
+            if pool.pool is not None:
+                idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "in_use": self._in_use,
+                "idle": idle,
+                "waits": self._waits,
+                "requests": self._requests,
+                "connections_opened": opened,
+            }
+
+    def close(self):
+        self._session.close()
+
@@ -0,0 +1,67 @@
+"""
+Agrupación de llamadas en micro-lotes.
+
+Las solicitudes que llegan dentro de una ventana corta (`max_wait_ms`) se
+juntan en una sola llamada upstream de hasta `max_batch` elementos, y cada
+llamador recibe su parte del resultado. Con mucho tráfico el número de
+llamadas (y lo que se factura por llamada) baja varias veces; con poco, la
+espera extra es la ventana, de unos milisegundos.
+"""
+import asyncio
+
+
+class MicroBatcher:
+    """
+    `flush(items)` es una corrutina que recibe la lista de elementos y devuelve
+    una lista de resultados en el mismo orden.
+    """
+
+    def __init__(self, flush, max_batch, max_wait_ms=5.0):
+        self._flush_fn = flush
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        """
+        Encola `item` en el lote actual y espera su resultado.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self._flush_fn([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,217 @@
+"""
+Detección y redacción local de datos personales (PII).
+
+Reemplaza, para los casos comunes, la llamada a Azure Language
+(`recognize_entities`) que usa el notebook: correos, teléfonos, tarjetas
+(con dígito de Luhn), IBAN (módulo 97), documentos de identidad (DNI/NIE de
+España, CUIT/CUIL de Argentina, SSN de EE. UU.) y direcciones IP.
+
+Todos los patrones forman una sola expresión regular compilada una vez por
+proceso, así que el texto se recorre una sola vez sin importar cuántas
+categorías haya. Cada coincidencia se confirma con el validador de su
+categoría (dígitos verificadores, rangos); si no pasa, se prueba el mismo
+fragmento contra las categorías siguientes (un número de tarjeta inválido
+todavía puede ser un teléfono).
+
+La redacción es reversible: cada valor distinto se reemplaza por un marcador
+estable (`[EMAIL_1]`, `[PHONE_2]`, ...) y `restore` vuelve a poner los
+valores originales en un texto que contenga esos marcadores.
+
+Variables de entorno:
+- `PII_ENABLED`: "false" desactiva la detección (por defecto activa).
+- `PII_CATEGORIES`: categorías a detectar, separadas por comas (por defecto todas).
+- `PII_ACTION`: qué hace `validatePrompt` si encuentra PII: `redact` (por defecto;
+  Content Safety analiza el texto redactado), `reject` (responde 400) o `report`
+  (sólo informa las entidades).
+"""
+import ipaddress
+import os
+import re
+import threading
+
+REDACT = "redact"
+REJECT = "reject"
+REPORT = "report"
+
+_CUIT_WEIGHTS = (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+_DNI_LETTERS = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+# Fechas (2024-05-17, 17/05/2024, 17.05.24), con o sin la hora: tienen la forma de un teléfono con separadores
+_DATE = re.compile(r"(?:\d{4}([-/.])\d{1,2}\1\d{1,2}|\d{1,2}([-/.])\d{1,2}\2(?:\d{4}|\d{2}))(?:[ T]\d{1,2})?")
+
+
+def _digits(text):
+    return "".join(char for char in text if char.isdigit())
+
+
+def luhn_valid(number):
+    total = 0
+    for index, char in enumerate(reversed(number)):
+        digit = int(char)
+        if index % 2:
+            digit = digit * 2 - 9 if digit > 4 else digit * 2
+        total += digit
+    return total % 10 == 0
+
+
+def _valid_card(text):
+    digits = _digits(text)
+    return 13 <= len(digits) <= 19 and luhn_valid(digits)
+
+
+def _valid_iban(text):
+    iban = text.replace(" ", "").upper()
+    if not 15 <= len(iban) <= 34:
+        return False
+    rearranged = iban[4:] + iban[:4]
+    return int("".join(str(int(char, 36)) for char in rearranged)) % 97 == 1
+
+
+def _valid_ssn(text):
+    area, group, serial = text.split("-")
+    return area not in ("000", "666") and area[0] != "9" and group != "00" and serial != "0000"
+
+
+def _valid_cuit(text):
+    digits = _digits(text)
+    check = 11 - sum(int(d) * w for d, w in zip(digits, _CUIT_WEIGHTS)) % 11
+    return {11: 0, 10: 9}.get(check, check) == int(digits[10])
+
+
+def _valid_dni(text):
+    value = text.replace("-", "").upper()
+    number = value[:-1].replace("X", "0").replace("Y", "1").replace("Z", "2")
+    return _DNI_LETTERS[int(number) % 23] == value[-1]
+
+
+def _valid_ip(text):
+    try:
+        ipaddress.ip_address(text)
+    except ValueError:
+        return False
+    # `cafe::beef`, `dead:beef::face`: palabras en hexadecimal, no direcciones
+    return any(char.isdigit() for char in text)
+
+
+def _valid_phone(text):
+    if _DATE.fullmatch(text):
+        return False
+    digits = _digits(text)
+    # Un número de 8-9 cifras sin prefijo ni separadores es más probable que sea un importe o un DNI
+    return 8 <= len(digits) <= 15 and (text.startswith("+") or len(digits) >= 10 or not text.isdigit())
+
+
+# IPv6 completa (8 grupos) o abreviada con `::` entre dos grupos; sin corchetes ni `:` a los lados,
+# para no tomar slices de Python (`a[1::2]`, `[::-1]`) ni nombres con ámbito (`std::vector`)
+_IPV6 = (r"(?<![\[\]:])(?:[0-9A-Fa-f]{1,4}(?::[0-9A-Fa-f]{1,4}){7}"
+         r"|[0-9A-Fa-f]{1,4}(?::[0-9A-Fa-f]{1,4}){0,5}::[0-9A-Fa-f]{1,4}(?::[0-9A-Fa-f]{1,4}){0,5})(?![\[\]:])")
+
+# (categoría, marcador, patrón, validador), en orden de prioridad
+CATEGORIES = [
+    ("Email", "EMAIL", r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}", None),
+    ("InternationalBankingAccountNumber", "IBAN", r"[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,3})?", _valid_iban),
+    ("USSocialSecurityNumber", "SSN", r"\d{3}-\d{2}-\d{4}", _valid_ssn),
+    ("ARNationalIdentityNumber", "CUIT", r"(?:20|23|24|27|30|33|34)-?\d{8}-?\d", _valid_cuit),
+    ("CreditCardNumber", "CARD", r"\d(?:[ -]?\d){12,18}", _valid_card),
+    ("ESDNI", "DNI", r"[XYZxyz]?-?\d{7,8}-?[A-Za-z]", _valid_dni),
+    ("IPAddress", "IP", r"(?:\d{1,3}\.){3}\d{1,3}|" + _IPV6, _valid_ip),
+    ("PhoneNumber", "PHONE", r"\+?(?:\(\d{1,4}\)|\d{1,4})(?:[ .-]?(?:\(\d{1,4}\)|\d{2,4})){1,5}", _valid_phone),
+]
+
+_PLACEHOLDER = re.compile(r"\[(?:%s)_\d+\]" % "|".join(label for _, label, _, _ in CATEGORIES))
+
+
+class PIIDetector:
+    """
+    Detector de PII con todas las categorías en una sola expresión regular.
+    """
+
+    def __init__(self, categories=None):
+        self._categories = [c for c in CATEGORIES if categories is None or c[0] in categories]
+        self._validators = {f"g{index}": entry for index, entry in enumerate(self._categories)}
+        # Sin letras, dígitos ni @ pegados a los lados: no corta palabras ni direcciones
+        alternatives = "|".join(f"(?P<g{index}>{entry[2]})" for index, entry in enumerate(self._categories))
+        self._pattern = re.compile(rf"(?<![\w@+.-])(?:{alternatives})(?![\w@]|\.\w)")
+        self._fallbacks = [(entry, re.compile(entry[2])) for entry in self._categories]
+        self._lock = threading.Lock()
+        self._scanned = 0
+        self._found = {}
+
+    @classmethod
+    def from_env(cls):
+        categories = os.getenv("PII_CATEGORIES")
+        return cls({name.strip() for name in categories.split(",")} if categories else None)
+
+    def _classify(self, group, text):
+        entry = self._validators[group]
+        if entry[3] is None or entry[3](text):
+            return entry
+        # El validador la descartó: puede ser de una categoría de menor prioridad
+        for position, (candidate, pattern) in enumerate(self._fallbacks):
+            if position > self._categories.index(entry) and pattern.fullmatch(text):
+                if candidate[3] is None or candidate[3](text):
+                    return candidate
+        return None
+
+    def scan(self, text):
+        """
+        Devuelve las entidades encontradas: `{"category", "text", "offset", "length"}`.
+        """
+        entities = []
+        for match in self._pattern.finditer(text):
+            entry = self._classify(match.lastgroup, match.group())
+            if entry is not None:
+                entities.append({"category": entry[0], "text": match.group(),
+                                 "offset": match.start(), "length": match.end() - match.start()})
+        with self._lock:
+            self._scanned += 1
+            for entity in entities:
+                self._found[entity["category"]] = self._found.get(entity["category"], 0) + 1
+        return entities
+
+    def redact(self, text, entities=None):
+        """
+        Reemplaza cada valor por un marcador; devuelve `(texto, {marcador: valor})`.
+        """
+        if entities is None:
+            entities = self.scan(text)
+        labels = {name: label for name, label, _, _ in CATEGORIES}
+        placeholders = {}
+        counters = {}
+        parts = []
+        last = 0
+        for entity in entities:
+            value = entity["text"]
+            placeholder = placeholders.get(value)
+            if placeholder is None:
+                label = labels[entity["category"]]
+                counters[label] = counters.get(label, 0) + 1
+                placeholder = placeholders[value] = f"[{label}_{counters[label]}]"
+            parts.append(text[last:entity["offset"]])
+            parts.append(placeholder)
+            last = entity["offset"] + entity["length"]
+        parts.append(text[last:])
+        return "".join(parts), {placeholder: value for value, placeholder in placeholders.items()}
+
+    def stats(self):
+        with self._lock:
+            return {"scanned": self._scanned, "found": dict(self._found)}
+
+
+def restore(text, mapping):
+    """
+    Vuelve a poner los valores originales en lugar de los marcadores de `redact`.
+    """
+    return _PLACEHOLDER.sub(lambda match: mapping.get(match.group(), match.group()), text)
+
+
+def summarize(entities):
+    """
+    Entidades sin el valor detectado, para devolver o registrar sin repetir el dato.
+    """
+    return [{key: entity[key] for key in ("category", "offset", "length")} for entity in entities]
+
+
+PII_ACTION = os.getenv("PII_ACTION", REDACT).lower()
+
+pii_detector = PIIDetector.from_env() if os.getenv("PII_ENABLED", "true").lower() != "false" else None
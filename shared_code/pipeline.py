@@ -0,0 +1,168 @@
+"""
+Pipeline de procesamiento del prompt: análisis de entidades, reescritura y seguridad.
+
+El notebook ejecuta las tres etapas una detrás de otra. Acá las etapas
+independientes corren en paralelo: el análisis de entidades y la verificación
+de seguridad del prompt original se lanzan junto con la reescritura, y sólo se
+vuelve a verificar la seguridad si el texto reescrito es distinto.
+
+Los prompts que llegan a la vez se envían juntos a Azure Language: el servicio
+acepta varios documentos por solicitud (`LANGUAGE_BATCH_MAX_DOCS`, 5 para
+entidades) y se espera a lo sumo `LANGUAGE_BATCH_WAIT_MS` para armar el lote.
+
+Azure descuenta `max_tokens` de la cuota TPM al admitir cada llamada, así que
+la reescritura no pide un máximo fijo sino el largo del prompt (contado
+localmente) por `REWRITE_MAX_TOKENS_RATIO` más `REWRITE_MAX_TOKENS_MARGIN`.
+Los prompts que con esa salida no entran en la ventana de contexto del
+corrector se rechazan antes de lanzar ninguna etapa (`PromptTooLong`).
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+
+from shared_code.circuit_breaker import breaker_for
+from shared_code.clients import registry
+from shared_code.completions import create_chat_completion
+from shared_code.content_safety import check_content_safety_async
+from shared_code.microbatch import MicroBatcher
+from shared_code.telemetry import stage
+from shared_code.tokens import count_tokens, ensure_fits
+
+LANGUAGE_ENDPOINT = os.getenv("LANGUAGE_ENDPOINT")
+LANGUAGE_KEY = os.getenv("LANGUAGE_KEY")
+LANGUAGE_DEFAULT = os.getenv("LANGUAGE_DEFAULT", "es")
+LANGUAGE_BATCH_MAX_DOCS = int(os.getenv("LANGUAGE_BATCH_MAX_DOCS", "5"))
+LANGUAGE_BATCH_WAIT_MS = float(os.getenv("LANGUAGE_BATCH_WAIT_MS", "5"))
+OPENAI_CORRECTOR_DEPLOYMENT = os.getenv("OPENAI_CORRECTOR_DEPLOYMENT", "gpt-35-turbo")
+REWRITE_MAX_TOKENS_RATIO = float(os.getenv("REWRITE_MAX_TOKENS_RATIO", "1.25"))
+REWRITE_MAX_TOKENS_MARGIN = int(os.getenv("REWRITE_MAX_TOKENS_MARGIN", "64"))
+
+REWRITE_SYSTEM_PROMPT = "Corrige la gramática del siguiente texto y mejora su claridad."
+
+
+async def _recognize_entities_batch(prompts):
+    """
+    Una sola llamada a Azure Language (API REST `analyze-text`) con un documento por prompt.
+    Devuelve, en el mismo orden, la lista de entidades o un dict de error por documento.
+    """
+    with stage("language", documents=len(prompts)):
+        response = await breaker_for("language").call_async(lambda: registry.http().post(
+            f"{LANGUAGE_ENDPOINT}/language/:analyze-text?api-version=2023-04-01",
+            headers={"Content-Type": "application/json", "Ocp-Apim-Subscription-Key": LANGUAGE_KEY},
+            json={
+                "kind": "EntityRecognition",
+                "analysisInput": {"documents": [
+                    {"id": str(index), "language": LANGUAGE_DEFAULT, "text": prompt} for index, prompt in enumerate(prompts)
+                ]},
+            },
+        ))
+    if response.status_code != 200:
+        logging.error(f"Error en Azure Language: {response.text}")
+        return [{"error": f"Error en API: {response.status_code}"}] * len(prompts)
+
+    results = response.json()["results"]
+    by_id = {doc["id"]: doc["entities"] for doc in results["documents"]}
+    for error in results.get("errors", []):
+        by_id[error["id"]] = {"error": error["error"].get("message", "Error en el documento")}
+    return [by_id.get(str(index), []) for index in range(len(prompts))]
+
+
+language_batcher = MicroBatcher(_recognize_entities_batch, LANGUAGE_BATCH_MAX_DOCS, LANGUAGE_BATCH_WAIT_MS)
+
+
+async def analyze_text_async(prompt):
+    """
+    Reconoce entidades del prompt con Azure Language, agrupado con los prompts que llegan a la vez.
+    """
+    if not LANGUAGE_ENDPOINT or not LANGUAGE_KEY:
+        logging.error("Faltan las credenciales de Azure Language")
+        return {"error": "Credenciales no configuradas"}
+
+    try:
+        return await language_batcher.submit(prompt)
+
+    except Exception as e:
+        logging.error(f"Error en analyze_text_async: {str(e)}")
+        return {"error": f"Falló la solicitud: {str(e)}"}
+
+
+def rewrite_messages(prompt):
+    return [
+        {"role": "system", "content": REWRITE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def rewrite_max_tokens(prompt):
+    """
+    Salida a reservar para la reescritura: el largo del prompt más un margen.
+    Lanza `PromptTooLong` si prompt y salida no entran en la ventana de contexto.
+    """
+    input_tokens = count_tokens(prompt, OPENAI_CORRECTOR_DEPLOYMENT)
+    max_tokens = math.ceil(input_tokens * REWRITE_MAX_TOKENS_RATIO) + REWRITE_MAX_TOKENS_MARGIN
+    ensure_fits(rewrite_messages(prompt), OPENAI_CORRECTOR_DEPLOYMENT, max_tokens)
+    return max_tokens
+
+
+async def rewrite_prompt_async(prompt, max_tokens=None):
+    """
+    Corrige la gramática y mejora la claridad del prompt con Azure OpenAI.
+    """
+    try:
+        max_tokens = max_tokens or rewrite_max_tokens(prompt)
+        response = await create_chat_completion(
+            messages=rewrite_messages(prompt),
+            max_tokens=max_tokens,
+            temperature=1.0,
+            top_p=1.0,
+            model=OPENAI_CORRECTOR_DEPLOYMENT
+        )
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            logging.warning(f"Reescritura cortada en {max_tokens} tokens")
+            return {"error": "La reescritura superó el máximo de tokens"}
+        return choice.message.content
+    except Exception as e:
+        logging.error(f"Error en OpenAI API: {str(e)}")
+        return {"error": f"Falló la solicitud: {str(e)}"}
+
+
+async def run_pipeline(prompt):
+    """
+    Ejecuta las etapas del pipeline y devuelve sus resultados junto con los tiempos (ms) de cada una.
+    Lanza `PromptTooLong` si el prompt no entra en la ventana de contexto del corrector.
+    """
+    max_tokens = rewrite_max_tokens(prompt)
+    timings = {}
+
+    async def timed(stage, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+    start = time.perf_counter()
+    analysis_result, safety_result, corrected_prompt = await asyncio.gather(
+        timed("textAnalysis", analyze_text_async(prompt)),
+        timed("contentSafety", check_content_safety_async(prompt)),
+        timed("rewrite", rewrite_prompt_async(prompt, max_tokens)),
+    )
+
+    # Sólo se vuelve a verificar si la reescritura produjo un texto distinto
+    corrected_safety = None
+    if isinstance(corrected_prompt, str) and corrected_prompt.strip() != prompt.strip():
+        corrected_safety = await timed("correctedContentSafety", check_content_safety_async(corrected_prompt))
+    timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+
+    is_flagged = safety_result["is_flagged"] or bool(corrected_safety and corrected_safety["is_flagged"])
+    return {
+        "originalPrompt": prompt,
+        "correctedPrompt": corrected_prompt,
+        "textAnalysis": analysis_result,
+        "contentSafety": {"original": safety_result, "corrected": corrected_safety},
+        "isFlagged": is_flagged,
+        "timings": timings,
+    }
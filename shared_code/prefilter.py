@@ -0,0 +1,202 @@
+"""
+Pre-filtro local que se ejecuta antes de llamar a Azure Content Safety.
+
+Resuelve en microsegundos los prompts obvios y sólo deja pasar a la API (lenta
+y paga) los dudosos:
+
+- Rechazo claro: coincide con la lista de bloqueo, tiene muchos caracteres de
+  control o es texto repetido (spam).
+- Aprobación clara: es corto, usa sólo caracteres comunes y no contiene
+  ningún término de la lista de vigilancia.
+- Todo lo demás es "dudoso" y se envía a Content Safety.
+
+El largo no es motivo de rechazo: los prompts largos se analizan en fragmentos
+(ver `shared_code.chunking`) y el tope lo pone `PROMPT_MAX_CHARS` en
+`shared_code.engine`, con un 413 en lugar de un veredicto de seguridad.
+
+Las listas se buscan con un autómata Aho-Corasick compilado una sola vez, así
+que el costo no depende de cuántos términos tengan.
+
+Variables de entorno:
+- `PREFILTER_ENABLED`: "false" desactiva el pre-filtro (por defecto activo).
+- `PREFILTER_BLOCKLIST` / `PREFILTER_WATCHLIST`: rutas a listas propias (un término por línea).
+- `PREFILTER_PASS_MAX_CHARS`: largo máximo para una aprobación local (por defecto 200; 0 la desactiva).
+"""
+import logging
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import deque
+
+from shared_code.verdict_cache import normalize_prompt
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+REJECT = "reject"
+PASS = "pass"
+AMBIGUOUS = "ambiguous"
+
+# Caracteres de formato usados para ofuscar términos (espacios de ancho cero, etc.)
+_INVISIBLE = {"Cf"}
+_CONTROL = {"Cc", "Co", "Cn", "Cs"}
+# Texto latino común (español/inglés); otros alfabetos siempre van a la API
+COMMON_TEXT = re.compile(r"[0-9A-Za-zÀ-ÖØ-öø-ÿ_\s.,;:¿?¡!'\"()\-–—/%$€@#&*+=<>\[\]{}…«»“”‘’]*")
+
+
+class AhoCorasick:
+    """
+    Autómata Aho-Corasick para buscar muchos términos en una sola pasada sobre el texto.
+    """
+
+    def __init__(self, patterns, whole_words=True):
+        self.whole_words = whole_words
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(pattern)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0) if node else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text):
+        """
+        Devuelve `(posición, término)` por cada aparición de un término en `text`.
+        """
+        matches = []
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for pattern in self._output[node]:
+                start = index - len(pattern) + 1
+                if self.whole_words and not self._is_word(text, start, index + 1):
+                    continue
+                matches.append((start, pattern))
+        return matches
+
+    @staticmethod
+    def _is_word(text, start, end):
+        before = text[start - 1] if start > 0 else " "
+        after = text[end] if end < len(text) else " "
+        return not before.isalnum() and not after.isalnum()
+
+
+def load_terms(path):
+    """
+    Lee una lista de términos (uno por línea, `#` para comentarios) y los normaliza.
+    """
+    with open(path, encoding="utf-8") as f:
+        terms = (normalize_prompt(line.split("#", 1)[0]) for line in f)
+        return sorted({term for term in terms if term})
+
+
+class Prefilter:
+    """
+    Clasificador local de primera pasada: `reject`, `pass` o `ambiguous`.
+    """
+
+    def __init__(self, blocklist, watchlist, pass_max_chars=200):
+        self.pass_max_chars = pass_max_chars
+        self._blocklist = AhoCorasick(blocklist)
+        # En la lista de vigilancia importa más no perder nada: también busca dentro de palabras
+        self._watchlist = AhoCorasick(watchlist, whole_words=False)
+        self._lock = threading.Lock()
+        self._counts = {REJECT: 0, PASS: 0, AMBIGUOUS: 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            blocklist=load_terms(os.getenv("PREFILTER_BLOCKLIST", os.path.join(DATA_DIR, "blocklist.txt"))),
+            watchlist=load_terms(os.getenv("PREFILTER_WATCHLIST", os.path.join(DATA_DIR, "watchlist.txt"))),
+            pass_max_chars=int(os.getenv("PREFILTER_PASS_MAX_CHARS", "200")),
+        )
+
+    def classify(self, prompt, record=True):
+        result = self._classify(prompt)
+        if record:
+            with self._lock:
+                self._counts[result["decision"]] += 1
+        return result
+
+    def _classify(self, prompt):
+        categories = [unicodedata.category(char) for char in prompt]
+        control = sum(1 for char, category in zip(prompt, categories) if category in _CONTROL and char not in "\n\r\t")
+        if control > max(3, len(prompt) * 0.05):
+            return {"decision": REJECT, "reason": "Demasiados caracteres de control o no asignados"}
+
+        if _is_repetitive(prompt):
+            return {"decision": REJECT, "reason": "Texto repetitivo"}
+
+        # Se quitan los caracteres invisibles antes de buscar, para que no sirvan para ocultar términos
+        invisible = any(category in _INVISIBLE for category in categories)
+        text = normalize_prompt("".join(c for c, cat in zip(prompt, categories) if cat not in _INVISIBLE))
+
+        blocked = self._blocklist.find_all(text)
+        if blocked:
+            return {"decision": REJECT, "reason": "Coincide con la lista de bloqueo", "matches": sorted({t for _, t in blocked})}
+
+        watched = self._watchlist.find_all(text)
+        if watched:
+            return {"decision": AMBIGUOUS, "reason": "Contiene términos sensibles", "matches": sorted({t for _, t in watched})}
+
+        if invisible or len(prompt) > self.pass_max_chars or not COMMON_TEXT.fullmatch(prompt):
+            return {"decision": AMBIGUOUS, "reason": "Requiere análisis remoto"}
+
+        return {"decision": PASS, "reason": "Prompt corto sin términos sensibles"}
+
+    def stats(self):
+        with self._lock:
+            total = sum(self._counts.values())
+            avoided = self._counts[REJECT] + self._counts[PASS]
+            return {
+                **self._counts,
+                "total": total,
+                "upstream_avoided_ratio": round(avoided / total, 4) if total else 0.0,
+            }
+
+
+def _is_repetitive(prompt):
+    """
+    Detecta spam: el texto se comprime demasiado bien o repite un mismo carácter muchas veces.
+    """
+    if re.search(r"([^\W_])\1{49,}", prompt):
+        return True
+    if len(prompt) < 200:
+        return False
+    raw = prompt.encode("utf-8")
+    return len(zlib.compress(raw)) / len(raw) < 0.08
+
+
+prefilter = None
+if os.getenv("PREFILTER_ENABLED", "true").lower() != "false":
+    try:
+        prefilter = Prefilter.from_env()
+    except OSError as e:
+        logging.error(f"No se pudo cargar el pre-filtro: {str(e)}")
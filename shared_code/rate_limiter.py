@@ -0,0 +1,223 @@
+"""
+Control de admisión del lado del cliente para las implementaciones de Azure OpenAI.
+
+Cada implementación tiene una cuota de tokens por minuto (TPM) y de solicitudes
+por minuto (RPM); las del README están en 10K TPM. En vez de enterarse por los
+429, cada llamada reserva antes sus tokens estimados en dos "token buckets"
+(solicitudes y tokens). Si no hay cupo, espera hasta `RATE_LIMIT_MAX_WAIT`
+segundos y, si aun así no alcanza, se descarta con `RateLimitExceeded`.
+
+Los buckets se ajustan con los headers `x-ratelimit-remaining-*` (y
+`x-ratelimit-limit-*` si vienen) de cada respuesta, y un 429 con
+`retry-after` pausa la implementación hasta ese momento.
+
+Variables de entorno:
+- `OPENAI_TPM_LIMIT` / `OPENAI_RPM_LIMIT`: cuota por defecto (10000 / 60).
+- `OPENAI_RATE_LIMITS`: JSON por implementación, p. ej. `{"respuesta-deployment": {"tpm": 10000, "rpm": 60}}`.
+- `RATE_LIMIT_HEADROOM`: fracción de la cuota a usar (por defecto 0.9, para quedar justo por debajo).
+- `RATE_LIMIT_MAX_WAIT`: segundos máximos en cola antes de descartar (por defecto 5).
+- `OPENAI_COMPLETION_TOKENS_ESTIMATE`: tokens de salida supuestos cuando no se pasa `max_tokens` (por defecto 1000).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from shared_code.tokens import count_message_tokens
+
+COMPLETION_TOKENS_ESTIMATE = int(os.getenv("OPENAI_COMPLETION_TOKENS_ESTIMATE", "1000"))
+
+
+def estimate_tokens(messages, max_tokens=None, model=None):
+    """
+    Estimación de los tokens que Azure descuenta de la cuota al admitir la solicitud:
+    los tokens de los mensajes (contados localmente) más los tokens de salida reservados.
+    """
+    return count_message_tokens(messages, model) + (max_tokens or COMPLETION_TOKENS_ESTIMATE)
+
+
+class RateLimitExceeded(Exception):
+    """
+    No hay cupo en la implementación y la espera superaría el máximo permitido.
+    """
+
+    def __init__(self, deployment, retry_after):
+        super().__init__(f"Cuota agotada en '{deployment}', reintentar en {retry_after:.1f}s")
+        self.deployment = deployment
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Bucket que se rellena de forma continua hasta `capacity` a razón de `capacity` por minuto.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self):
+        return self.capacity / 60.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount):
+        """
+        Segundos que faltan para poder tomar `amount` (0 si ya se puede).
+        """
+        self._refill()
+        # Una solicitud más grande que la capacidad se admite cuando el bucket está lleno
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def available(self):
+        self._refill()
+        return max(0.0, self.tokens)
+
+    def clamp(self, remaining):
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+
+class DeploymentLimiter:
+    """
+    Buckets de solicitudes y de tokens de una implementación.
+    """
+
+    def __init__(self, name, tpm, rpm, headroom=0.9, max_wait=5.0):
+        self.name = name
+        self.headroom = headroom
+        self.max_wait = max_wait
+        self.tokens = TokenBucket(tpm * headroom)
+        self.requests = TokenBucket(max(1.0, rpm * headroom))
+        self._paused_until = 0.0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.throttled = 0
+
+    async def acquire(self, estimated_tokens):
+        """
+        Reserva una solicitud y `estimated_tokens`; espera si hace falta o lanza `RateLimitExceeded`.
+        """
+        deadline = time.monotonic() + self.max_wait
+        waited = False
+        while True:
+            now = time.monotonic()
+            wait = max(
+                self._paused_until - now,
+                self.requests.wait_time(1),
+                self.tokens.wait_time(estimated_tokens),
+            )
+            if wait <= 0:
+                self.requests.take(1)
+                self.tokens.take(estimated_tokens)
+                self.admitted += 1
+                return
+            if now + wait > deadline:
+                self.shed += 1
+                raise RateLimitExceeded(self.name, wait)
+            if not waited:
+                self.queued += 1
+                waited = True
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """
+        Ajusta los buckets con lo que informa el servicio: nunca más cupo del que dice que queda.
+        El margen (`headroom`) se aplica sólo a la capacidad; lo que queda se toma tal cual,
+        porque el bucket ya se rellena al ritmo reducido.
+        """
+        for bucket, kind in ((self.tokens, "tokens"), (self.requests, "requests")):
+            limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+            if limit:
+                bucket.capacity = limit * self.headroom
+            remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+            if remaining is not None:
+                bucket.clamp(remaining)
+
+    def throttle(self, retry_after):
+        """
+        El servicio respondió 429: no se admite nada más hasta que pase `retry_after`.
+        """
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        self.tokens.clamp(0)
+
+    def stats(self):
+        return {
+            "tokens_available": round(self.tokens.available()),
+            "tpm_capacity": round(self.tokens.capacity),
+            "rpm_capacity": round(self.requests.capacity),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "throttled": self.throttled,
+        }
+
+
+def _header_number(headers, name):
+    value = headers.get(name) if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    Un `DeploymentLimiter` por implementación, creado con la configuración de entorno.
+    """
+
+    def __init__(self, default_tpm, default_rpm, overrides=None, headroom=0.9, max_wait=5.0):
+        self.default_tpm = default_tpm
+        self.default_rpm = default_rpm
+        self.overrides = overrides or {}
+        self.headroom = headroom
+        self.max_wait = max_wait
+        self._limiters = {}
+
+    @classmethod
+    def from_env(cls):
+        try:
+            overrides = json.loads(os.getenv("OPENAI_RATE_LIMITS", "{}"))
+        except ValueError:
+            logging.error("OPENAI_RATE_LIMITS no es un JSON válido; se usan las cuotas por defecto")
+            overrides = {}
+        return cls(
+            default_tpm=float(os.getenv("OPENAI_TPM_LIMIT", "10000")),
+            default_rpm=float(os.getenv("OPENAI_RPM_LIMIT", "60")),
+            overrides=overrides,
+            headroom=float(os.getenv("RATE_LIMIT_HEADROOM", "0.9")),
+            max_wait=float(os.getenv("RATE_LIMIT_MAX_WAIT", "5")),
+        )
+
+    def for_deployment(self, deployment):
+        limiter = self._limiters.get(deployment)
+        if limiter is None:
+            config = self.overrides.get(deployment, {})
+            limiter = DeploymentLimiter(
+                deployment,
+                tpm=float(config.get("tpm", self.default_tpm)),
+                rpm=float(config.get("rpm", self.default_rpm)),
+                headroom=self.headroom,
+                max_wait=self.max_wait,
+            )
+            self._limiters[deployment] = limiter
+        return limiter
+
+    def stats(self):
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
+
+
+rate_limiter = RateLimiter.from_env()
@@ -0,0 +1,153 @@
+"""
+Caché de respuestas de `generateResponse`.
+
+Primero se busca el prompt exacto, por implementación; sólo se ignoran los
+espacios al inicio y al final, porque mayúsculas e indentación pueden cambiar
+la respuesta (sobre todo en prompts con código). Si no está y
+`RESPONSE_CACHE_SIMILARITY` está configurado, se busca un prompt casi igual
+(normalizado): cada prompt tiene una firma SimHash de 64 bits (palabras y pares de
+palabras) y dos prompts se consideran equivalentes si la fracción de bits
+iguales llega al umbral. Las firmas se indexan por bandas (LSH), así la
+búsqueda sólo compara contra unos pocos candidatos.
+
+Ojo: un umbral bajo puede devolver la respuesta de una pregunta parecida pero
+distinta ("capital de Francia" / "capital de Italia"); por eso la búsqueda
+aproximada está apagada por defecto y conviene usar valores altos (≥ 0.95).
+
+Variables de entorno:
+- `RESPONSE_CACHE_SIZE`: respuestas máximas en memoria (por defecto 1000; 0 desactiva la caché).
+- `RESPONSE_CACHE_TTL`: segundos de validez de una respuesta (por defecto 600).
+- `RESPONSE_CACHE_SIMILARITY`: similitud mínima (0-1) para la búsqueda aproximada (opcional).
+"""
+import hashlib
+import os
+import threading
+import time
+
+from shared_code.cache import TTLCache
+from shared_code.verdict_cache import exact_key, normalize_prompt
+
+SIGNATURE_BITS = 64
+
+
+def simhash(text):
+    """
+    Firma SimHash de 64 bits del texto normalizado (palabras y pares de palabras).
+    """
+    words = normalize_prompt(text).split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    weights = [0] * SIGNATURE_BITS
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIGNATURE_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def similarity(a, b):
+    return 1 - bin(a ^ b).count("1") / SIGNATURE_BITS
+
+
+class ResponseCache:
+    """
+    Respuestas por prompt exacto, con búsqueda opcional de prompts casi iguales.
+    """
+
+    def __init__(self, max_size, ttl, similarity_threshold=None):
+        self.enabled = max_size > 0
+        self.similarity_threshold = similarity_threshold
+        self._cache = TTLCache(max(max_size, 1), ttl, on_evict=self._unindex)
+        self._lock = threading.Lock()
+        self.similar_hits = 0
+
+        # Si dos firmas difieren en a lo sumo `k` bits, con k+1 bandas al menos una coincide entera
+        self._bands = []
+        if similarity_threshold:
+            max_distance = int((1 - similarity_threshold) * SIGNATURE_BITS)
+            count = min(max_distance + 1, SIGNATURE_BITS)
+            width = SIGNATURE_BITS // count
+            self._bands = [(i * width, SIGNATURE_BITS if i == count - 1 else (i + 1) * width) for i in range(count)]
+        self._index = [{} for _ in self._bands]
+
+    @classmethod
+    def from_env(cls):
+        threshold = os.getenv("RESPONSE_CACHE_SIMILARITY")
+        return cls(
+            max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "600")),
+            similarity_threshold=float(threshold) if threshold else None,
+        )
+
+    def _band_values(self, signature):
+        return [(signature >> start) & ((1 << (end - start)) - 1) for start, end in self._bands]
+
+    def _unindex(self, key, entry):
+        if "signature" not in entry:
+            return
+        with self._lock:
+            for buckets, value in zip(self._index, self._band_values(entry["signature"])):
+                keys = buckets.get(value)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del buckets[value]
+
+    def get(self, prompt, model):
+        """
+        Devuelve `(respuesta, "exact" | "similar")` o None si no hay una respuesta guardada.
+        """
+        if not self.enabled:
+            return None
+        entry = self._cache.get(exact_key(prompt.strip(), model))
+        if entry is not None:
+            entry["hits"] += 1
+            return entry["response"], "exact"
+        if not self._bands:
+            return None
+
+        signature = simhash(prompt)
+        with self._lock:
+            candidates = set()
+            for buckets, value in zip(self._index, self._band_values(signature)):
+                candidates.update(buckets.get(value, ()))
+
+        best = None
+        for key in candidates:
+            entry = self._cache.peek(key)
+            if entry is None or entry["model"] != model:
+                continue
+            score = similarity(signature, entry["signature"])
+            if score >= self.similarity_threshold and (best is None or score > best[0]):
+                best = (score, entry)
+        if best is None:
+            return None
+        best[1]["hits"] += 1
+        self.similar_hits += 1
+        return best[1]["response"], "similar"
+
+    def put(self, prompt, model, response):
+        if not self.enabled:
+            return
+        key = exact_key(prompt.strip(), model)
+        entry = {"prompt": prompt[:200], "model": model, "response": response, "hits": 0, "created": time.time()}
+        if self._bands:
+            entry["signature"] = simhash(prompt)
+            with self._lock:
+                for buckets, value in zip(self._index, self._band_values(entry["signature"])):
+                    buckets.setdefault(value, set()).add(key)
+        self._cache.put(key, entry)
+
+    def stats(self, top=5):
+        stats = self._cache.stats()
+        stats["enabled"] = self.enabled
+        stats["similarity_threshold"] = self.similarity_threshold
+        stats["similar_hits"] = self.similar_hits
+        entries = self._cache.values()
+        stats["top_entries"] = [
+            {"prompt": entry["prompt"][:80], "model": entry["model"], "hits": entry["hits"]}
+            for entry in sorted(entries, key=lambda e: e["hits"], reverse=True)[:top] if entry["hits"]
+        ]
+        return stats
+
+
+response_cache = ResponseCache.from_env()
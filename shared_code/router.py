@@ -0,0 +1,145 @@
+"""
+Enrutamiento de `generateResponse` por complejidad del prompt.
+
+Cada prompt recibe localmente un puntaje entre 0 y 1 a partir de:
+
+- largo: tokens del prompt (conteo local), saturando en `ROUTER_LONG_TOKENS`;
+- tarea: verbos y expresiones de tareas exigentes ("analiza", "paso a paso",
+  "código", "compare", ...), buscados con el mismo autómata del pre-filtro;
+- estructura: bloques de código, varias líneas o varias preguntas;
+- idioma: texto fuera del alfabeto latino común, donde los modelos chicos rinden peor.
+
+La tabla de rutas se recorre en orden y se usa la primera cuyo `max_score`
+no sea menor que el puntaje (la última ruta no necesita `max_score`). Por
+defecto todo va a `OPENAI_RESPUESTA_DEPLOYMENT`; con
+`OPENAI_SIMPLE_DEPLOYMENT` los prompts simples van a esa implementación.
+
+Por ruta se registran solicitudes, latencia (p50/p95/p99) y tokens de
+entrada y salida, expuestos en `/metrics`, para ajustar los umbrales.
+
+Variables de entorno:
+- `OPENAI_SIMPLE_DEPLOYMENT`: implementación rápida y barata para prompts simples (opcional).
+- `ROUTER_SIMPLE_MAX_SCORE`: puntaje máximo de un prompt simple (por defecto 0.3).
+- `ROUTER_LONG_TOKENS`: tokens a partir de los cuales el largo suma el máximo (por defecto 400).
+- `MODEL_ROUTES`: tabla completa en JSON; reemplaza a las anteriores, p. ej.
+  `[{"name": "simple", "deployment": "respuesta-deployment", "max_score": 0.3}, {"name": "complex", "deployment": "gpt-4"}]`.
+"""
+import json
+import os
+import re
+import threading
+
+from shared_code.prefilter import COMMON_TEXT, AhoCorasick
+from shared_code.telemetry import LatencyHistogram
+from shared_code.tokens import count_tokens
+from shared_code.verdict_cache import normalize_prompt
+
+TASK_KEYWORDS = [
+    # Español
+    "analiza", "analizar", "análisis", "compara", "comparar", "explica", "explicar", "detalladamente",
+    "paso a paso", "demuestra", "demostrar", "código", "programa", "función", "algoritmo", "optimiza",
+    "optimizar", "diseña", "diseñar", "ensayo", "redacta", "resume", "resumir", "traduce", "traducir",
+    "calcula", "calcular", "por qué", "evalúa", "ventajas y desventajas", "estrategia", "implementa",
+    # Inglés
+    "analyze", "analyse", "compare", "explain", "step by step", "prove", "code", "implement", "debug",
+    "design", "essay", "summarize", "translate", "calculate", "why", "evaluate", "pros and cons", "strategy",
+]
+
+# Aporte máximo de cada característica al puntaje
+WEIGHTS = {"length": 0.45, "task": 0.35, "structure": 0.2, "language": 0.35}
+
+_CODE = re.compile(r"```|^\s{4}\S|[{};]\s*$|\bdef |\bclass |\bSELECT\b", re.MULTILINE)
+
+
+class Route:
+    def __init__(self, name, deployment, max_score=None):
+        self.name = name
+        self.deployment = deployment
+        self.max_score = max_score
+        self.latency = LatencyHistogram()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+
+class ModelRouter:
+    """
+    Elige la implementación de OpenAI según el puntaje de complejidad del prompt.
+    """
+
+    def __init__(self, routes, long_tokens=400):
+        self.routes = routes
+        self.long_tokens = long_tokens
+        self._keywords = AhoCorasick(sorted({normalize_prompt(k) for k in TASK_KEYWORDS}))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        default = os.getenv("OPENAI_RESPUESTA_DEPLOYMENT", "gpt-4")
+        table = os.getenv("MODEL_ROUTES")
+        if table:
+            routes = [Route(r["name"], r["deployment"], r.get("max_score")) for r in json.loads(table)]
+        elif os.getenv("OPENAI_SIMPLE_DEPLOYMENT"):
+            routes = [
+                Route("simple", os.getenv("OPENAI_SIMPLE_DEPLOYMENT"), float(os.getenv("ROUTER_SIMPLE_MAX_SCORE", "0.3"))),
+                Route("complex", default),
+            ]
+        else:
+            routes = [Route("default", default)]
+        return cls(routes, long_tokens=int(os.getenv("ROUTER_LONG_TOKENS", "400")))
+
+    def score(self, prompt, model=None):
+        """
+        Devuelve `(puntaje, características)`; cada característica está entre 0 y su peso.
+        """
+        text = normalize_prompt(prompt)
+        tasks = {term for _, term in self._keywords.find_all(text)}
+        structure = 0.0
+        if _CODE.search(prompt):
+            structure += 1.0
+        if prompt.count("\n") >= 3 or prompt.count("?") >= 2:
+            structure += 0.5
+        features = {
+            "length": WEIGHTS["length"] * min(count_tokens(prompt, model) / self.long_tokens, 1.0),
+            "task": WEIGHTS["task"] * min(len(tasks) / 2, 1.0),
+            "structure": WEIGHTS["structure"] * min(structure, 1.0),
+            "language": 0.0 if COMMON_TEXT.fullmatch(prompt) else WEIGHTS["language"],
+        }
+        return min(sum(features.values()), 1.0), {name: round(value, 3) for name, value in features.items()}
+
+    def route(self, prompt):
+        """
+        Devuelve `(ruta, puntaje)` para el prompt.
+        """
+        if len(self.routes) == 1:
+            return self.routes[0], None
+        score, _ = self.score(prompt, self.routes[-1].deployment)
+        for route in self.routes:
+            if route.max_score is None or score <= route.max_score:
+                return route, score
+        return self.routes[-1], score
+
+    def record(self, route, seconds, usage=None):
+        with self._lock:
+            route.requests += 1
+            route.latency.record(seconds)
+            if usage is not None:
+                route.prompt_tokens += usage.prompt_tokens or 0
+                route.completion_tokens += usage.completion_tokens or 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                route.name: {
+                    "deployment": route.deployment,
+                    "max_score": route.max_score,
+                    "requests": route.requests,
+                    "prompt_tokens": route.prompt_tokens,
+                    "completion_tokens": route.completion_tokens,
+                    "latency": route.latency.snapshot(),
+                }
+                for route in self.routes
+            }
+
+
+model_router = ModelRouter.from_env()
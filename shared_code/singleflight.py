@@ -0,0 +1,76 @@
+"""
+Coalescencia de solicitudes idénticas en vuelo ("single-flight").
+
+Si llega el mismo prompt varias veces mientras la primera llamada upstream
+todavía no terminó, las siguientes no hacen otra llamada: esperan la que ya
+está en curso y reciben su mismo resultado. Al terminar, la clave se libera y
+la próxima solicitud vuelve a llamar (o encuentra el resultado en la caché).
+
+El resultado es el mismo objeto para todos los que esperan; se trata como de
+sólo lectura. Si se cancelan todos los que esperan una llamada (por ejemplo,
+una generación especulativa descartada), la llamada también se cancela.
+"""
+import asyncio
+
+_groups = []
+
+
+class SingleFlight:
+    """
+    Llamadas asíncronas en vuelo por clave, dentro del event loop del worker.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._inflight = {}
+        self._waiters = {}
+        self.leaders = 0
+        self.followers = 0
+        self.cancelled = 0
+        _groups.append(self)
+
+    async def do(self, key, factory):
+        """
+        Devuelve el resultado de `factory()`, compartiendo la llamada con las demás de la misma `key`.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._release(key, task))
+        else:
+            self.followers += 1
+        # shield: si se cancela una de las solicitudes, la llamada compartida sigue para las demás
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                # Nadie más la espera: se cancela y la clave queda libre para una llamada nueva
+                self.cancelled += 1
+                self._release(key, task)
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _release(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self):
+        total = self.leaders + self.followers
+        return {
+            "inflight": len(self._inflight),
+            "upstream_calls": self.leaders,
+            "coalesced": self.followers,
+            "cancelled": self.cancelled,
+            "coalesced_ratio": round(self.followers / total, 4) if total else 0.0,
+        }
+
+
+def single_flight_stats():
+    return {group.name: group.stats() for group in _groups}
@@ -0,0 +1,65 @@
+"""
+Generación en streaming con Server-Sent Events (SSE).
+
+En lugar de esperar la respuesta completa, cada fragmento de texto se envía al
+cliente apenas llega de OpenAI (evento `token`). Al final se envía un evento
+`done` con el uso de tokens y la latencia (primer token y total).
+"""
+import json
+import logging
+import time
+
+from shared_code.circuit_breaker import CircuitOpen
+from shared_code.completions import create_chat_completion
+from shared_code.rate_limiter import RateLimitExceeded
+from shared_code.telemetry import stage_metrics
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_completion(prompt, model):
+    """
+    Generador asíncrono de eventos SSE para la respuesta del modelo a `prompt`.
+    """
+    start = time.perf_counter()
+    first_token_ms = None
+    usage = None
+
+    try:
+        stream = await create_chat_completion(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            # Azure envía fragmentos sin `choices` (resultados de filtros y el uso final)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token_ms is None:
+                    stage_metrics.record("openaiFirstToken", time.perf_counter() - start)
+                    first_token_ms = round((time.perf_counter() - start) * 1000, 2)
+                yield sse_event("token", {"content": chunk.choices[0].delta.content})
+            if chunk.usage:
+                usage = chunk.usage.model_dump()
+
+    except RateLimitExceeded as e:
+        logging.warning(f"stream_completion descartada: {str(e)}")
+        yield sse_event("error", {"error": "Cuota de OpenAI agotada, reintente más tarde", "retryAfter": round(e.retry_after, 1)})
+        return
+
+    except CircuitOpen as e:
+        yield sse_event("error", {"error": "Servicio de OpenAI no disponible, reintente más tarde", "retryAfter": round(e.retry_after, 1)})
+        return
+
+    except Exception as e:
+        logging.error(f"Error en stream_completion: {str(e)}")
+        yield sse_event("error", {"error": "Error en la generación de respuesta", "details": str(e)})
+        return
+
+    stage_metrics.record("openaiStream", time.perf_counter() - start)
+    yield sse_event("done", {
+        "usage": usage,
+        "latency": {"firstTokenMs": first_token_ms, "totalMs": round((time.perf_counter() - start) * 1000, 2)}
+    })
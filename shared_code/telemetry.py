@@ -0,0 +1,170 @@
+"""
+Métricas de latencia por etapa y trazas compatibles con OpenTelemetry.
+
+Cada etapa (parseo de la solicitud, Content Safety, OpenAI, Azure Language,
+serialización) se mide con `stage(nombre)`. La duración se guarda en un
+histograma estilo HDR (buckets log-lineales con ~1,5 % de error relativo, en
+memoria constante) del que salen p50/p95/p99 para `/metrics`.
+
+Si OpenTelemetry está instalado, `stage` abre además un span con el mismo
+nombre. El exportador se elige con `TELEMETRY_EXPORTER`:
+- `appinsights`: Application Insights (requiere `azure-monitor-opentelemetry`
+  y `APPLICATIONINSIGHTS_CONNECTION_STRING`).
+- `file`: un span JSON por línea en `TELEMETRY_FILE` (requiere `opentelemetry-sdk`).
+- `none` (por defecto): sólo histogramas.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 2^7 sub-buckets por potencia de dos: la mitad superior da 64 pasos por octava
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT // 2
+
+
+class LatencyHistogram:
+    """
+    Histograma de latencias en microsegundos con buckets log-lineales (como HdrHistogram).
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _index(value):
+        if value < SUB_BUCKET_COUNT:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return SUB_BUCKET_HALF * shift + (value >> shift)
+
+    @staticmethod
+    def _bounds(index):
+        if index < SUB_BUCKET_COUNT:
+            return index, index
+        shift = index // SUB_BUCKET_HALF - 1
+        low = (index - SUB_BUCKET_HALF * shift) << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        index = self._index(value)
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+            self.min = value if self.min is None else min(self.min, value)
+
+    def percentile(self, percent):
+        """
+        Valor (µs) por debajo del cual está el `percent` % de las muestras.
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            target = max(1, round(self.count * percent / 100))
+            seen = 0
+            for index in sorted(self._counts):
+                seen += self._counts[index]
+                if seen >= target:
+                    low, high = self._bounds(index)
+                    return min((low + high) // 2, self.max)
+        return self.max
+
+    def snapshot(self):
+        def ms(value):
+            return round(value / 1000, 3) if value is not None else None
+
+        return {
+            "count": self.count,
+            "mean": ms(self.total / self.count) if self.count else None,
+            "min": ms(self.min),
+            "p50": ms(self.percentile(50)),
+            "p95": ms(self.percentile(95)),
+            "p99": ms(self.percentile(99)),
+            "max": ms(self.max) if self.count else None,
+        }
+
+
+class StageMetrics:
+    """
+    Un histograma por etapa, creado la primera vez que se registra.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, LatencyHistogram())
+        histogram.record(seconds)
+
+    def snapshot(self):
+        return {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+
+def _configure_tracer():
+    exporter = os.getenv("TELEMETRY_EXPORTER", "none").lower()
+    if exporter == "none":
+        return None
+
+    try:
+        from opentelemetry import trace
+
+        if exporter == "appinsights":
+            from azure.monitor.opentelemetry import configure_azure_monitor
+
+            configure_azure_monitor(connection_string=os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING"))
+        elif exporter == "file":
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+            out = open(os.getenv("TELEMETRY_FILE", "spans.jsonl"), "a", encoding="utf-8")
+            provider = TracerProvider()
+            provider.add_span_processor(BatchSpanProcessor(
+                ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+            ))
+            trace.set_tracer_provider(provider)
+        else:
+            logging.error(f"TELEMETRY_EXPORTER desconocido: {exporter}")
+            return None
+
+        return trace.get_tracer("promptguard")
+    except ImportError as e:
+        logging.warning(f"OpenTelemetry no disponible ({str(e)}): sólo se registran histogramas")
+        return None
+
+
+stage_metrics = StageMetrics()
+tracer = _configure_tracer()
+
+
+@contextmanager
+def stage(name, **attributes):
+    """
+    Mide el bloque como la etapa `name` y, si hay tracer, lo envuelve en un span.
+    """
+    start = time.perf_counter()
+    try:
+        if tracer is None:
+            yield None
+        else:
+            with tracer.start_as_current_span(name, attributes=attributes) as span:
+                yield span
+    finally:
+        stage_metrics.record(name, time.perf_counter() - start)
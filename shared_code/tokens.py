@@ -0,0 +1,113 @@
+"""
+Conteo local de tokens y ventana de contexto por implementación de Azure OpenAI.
+
+Con `tiktoken` instalado el conteo es exacto (`o200k_base` para las
+implementaciones gpt-4o, `cl100k_base` para el resto). Sin él se usa una
+aproximación que cuenta palabras y signos de puntuación, más un token por
+cada 4 caracteres de las palabras largas; en español tiende a sobrestimar
+un poco, que es el lado seguro para reservar cuota y controlar el contexto.
+
+Variables de entorno:
+- `OPENAI_CONTEXT_WINDOW`: ventana de contexto (tokens) por defecto si el nombre de la
+  implementación no indica el modelo (por defecto 8192, la de gpt-4).
+- `OPENAI_CONTEXT_WINDOWS`: JSON por implementación, p. ej. `{"corrector-deployment": 16384}`.
+"""
+import functools
+import json
+import logging
+import os
+import re
+
+# Por prefijo del modelo en el nombre de la implementación; se prueba el más largo primero
+KNOWN_CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4-turbo": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-35-turbo-16k": 16384,
+    "gpt-35-turbo": 4096,
+    "gpt-3.5-turbo": 4096,
+}
+
+DEFAULT_CONTEXT_WINDOW = int(os.getenv("OPENAI_CONTEXT_WINDOW", "8192"))
+CONTEXT_WINDOWS = json.loads(os.getenv("OPENAI_CONTEXT_WINDOWS", "{}"))
+
+# Tokens fijos por mensaje y para el inicio de la respuesta (formato de chat de OpenAI)
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+class PromptTooLong(Exception):
+    """
+    El prompt más la salida pedida no entran en la ventana de contexto de la implementación.
+    """
+
+    def __init__(self, deployment, tokens, limit):
+        super().__init__(f"El prompt ocupa {tokens} tokens y '{deployment}' admite {limit}")
+        self.deployment = deployment
+        self.tokens = tokens
+        self.limit = limit
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(name):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # La primera vez tiktoken descarga la codificación; sin red queda la aproximación
+        logging.warning(f"No se pudo cargar la codificación '{name}' de tiktoken: {str(e)}")
+        return None
+
+
+def _encoding_name(model):
+    return "o200k_base" if model and "gpt-4o" in model.lower() else "cl100k_base"
+
+
+def approximate_tokens(text):
+    return sum(1 + (len(piece) - 1) // 4 for piece in _PIECES.findall(text))
+
+
+def count_tokens(text, model=None):
+    encoding = _encoding(_encoding_name(model))
+    if encoding is None:
+        return approximate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages, model=None):
+    """
+    Tokens que ocupan los mensajes de chat en el prompt, incluido el formato de cada mensaje.
+    """
+    return TOKENS_PER_REPLY + sum(
+        TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "", model) + (1 if message.get("name") else 0)
+        for message in messages
+    )
+
+
+def context_window(deployment):
+    if deployment in CONTEXT_WINDOWS:
+        return int(CONTEXT_WINDOWS[deployment])
+    name = (deployment or "").lower()
+    for prefix in sorted(KNOWN_CONTEXT_WINDOWS, key=len, reverse=True):
+        if prefix in name:
+            return KNOWN_CONTEXT_WINDOWS[prefix]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def ensure_fits(messages, deployment, completion_tokens=0):
+    """
+    Devuelve los tokens del prompt o lanza `PromptTooLong` si con `completion_tokens`
+    de salida no entra en la ventana de contexto.
+    """
+    tokens = count_message_tokens(messages, deployment)
+    limit = context_window(deployment)
+    if tokens + completion_tokens > limit:
+        raise PromptTooLong(deployment, tokens + completion_tokens, limit)
+    return tokens
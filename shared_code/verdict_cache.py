@@ -0,0 +1,145 @@
+"""
+Caché de veredictos de Content Safety para prompts repetidos.
+
+Los reintentos, las UIs con plantillas y los bots envían el mismo prompt una y
+otra vez. El veredicto se guarda con la clave del prompt normalizado, primero
+en un LRU en memoria (acierto en microsegundos, sin llamar a Azure) y,
+opcionalmente, en un almacén compartido entre procesos (SQLite local).
+
+Variables de entorno:
+- `VERDICT_CACHE_SIZE`: entradas máximas en memoria (por defecto 10000; 0 desactiva la caché).
+- `VERDICT_CACHE_TTL`: segundos de validez de un veredicto (por defecto 3600).
+- `VERDICT_CACHE_SQLITE`: ruta de la base SQLite compartida (opcional).
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from shared_code.cache import TTLCache
+
+
+def normalize_prompt(prompt):
+    """
+    Normaliza Unicode (NFKC), mayúsculas y espacios para que variantes triviales compartan clave.
+    """
+    return " ".join(unicodedata.normalize("NFKC", prompt).casefold().split())
+
+
+def prompt_key(prompt, *params):
+    """
+    Hash SHA-256 del prompt normalizado y de los parámetros que afectan al resultado.
+    """
+    material = "\x1f".join([normalize_prompt(prompt), *(str(p) for p in params)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def exact_key(text, *params):
+    """
+    Hash SHA-256 del texto tal cual (sin normalizar) y de los parámetros. Para lo que
+    depende de mayúsculas y espacios, como las respuestas del modelo a código indentado.
+    """
+    material = "\x1f".join([text, *(str(p) for p in params)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SqliteVerdictStore:
+    """
+    Almacén compartido sencillo: una tabla `clave -> (veredicto JSON, expira_en)`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM verdicts WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class VerdictCache:
+    """
+    LRU en memoria con TTL delante de un almacén compartido opcional.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600, shared=None):
+        self.enabled = max_size > 0
+        self.ttl = ttl
+        self.shared = shared
+        self.shared_hits = 0
+        self._local = TTLCache(max(max_size, 1), ttl)
+
+    @classmethod
+    def from_env(cls):
+        shared = None
+        path = os.getenv("VERDICT_CACHE_SQLITE")
+        if path:
+            try:
+                shared = SqliteVerdictStore(path)
+            except sqlite3.Error as e:
+                logging.error(f"No se pudo abrir la caché compartida {path}: {str(e)}")
+        return cls(
+            max_size=int(os.getenv("VERDICT_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("VERDICT_CACHE_TTL", "3600")),
+            shared=shared,
+        )
+
+    def get(self, prompt):
+        if not self.enabled:
+            return None
+        key = prompt_key(prompt)
+        verdict = self._local.get(key)
+        if verdict is None and self.shared is not None:
+            try:
+                verdict = self.shared.get(key)
+            except sqlite3.Error as e:
+                logging.error(f"Error al leer la caché compartida: {str(e)}")
+                verdict = None
+            if verdict is not None:
+                self.shared_hits += 1
+                self._local.put(key, verdict)
+        return verdict
+
+    def put(self, prompt, verdict):
+        if not self.enabled:
+            return
+        key = prompt_key(prompt)
+        self._local.put(key, verdict)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, verdict, self.ttl)
+            except sqlite3.Error as e:
+                logging.error(f"Error al escribir la caché compartida: {str(e)}")
+
+    def stats(self):
+        stats = self._local.stats()
+        stats["enabled"] = self.enabled
+        stats["shared_backend"] = self.shared.path if self.shared is not None else None
+        stats["shared_hits"] = self.shared_hits
+        return stats
+
+
+verdict_cache = VerdictCache.from_env()
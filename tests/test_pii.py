@@ -0,0 +1,27 @@
+import pytest
+
+from shared_code.pii import PIIDetector
+
+detector = PIIDetector()
+
+
+@pytest.mark.parametrize("text", [
+    "print(a[1::2]) en python",
+    "invertir con arr[::2] o x[::-1]",
+    "a[10::2]",
+    "std::vector<int> v;",
+    "usar Foo::bar y cafe::beef",
+    "dead:beef::face",
+])
+def test_slices_and_scoped_names_are_not_pii(text):
+    assert detector.scan(text) == []
+
+
+@pytest.mark.parametrize("text, address", [
+    ("servidor 2001:db8::1 caído", "2001:db8::1"),
+    ("enlace local fe80::1", "fe80::1"),
+    ("2001:0db8:85a3:0000:0000:8a2e:0370:7334", "2001:0db8:85a3:0000:0000:8a2e:0370:7334"),
+    ("ip 192.168.0.1", "192.168.0.1"),
+])
+def test_ip_addresses_are_detected(text, address):
+    assert [(e["category"], e["text"]) for e in detector.scan(text)] == [("IPAddress", address)]
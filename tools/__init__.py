@@ -0,0 +1,3 @@
+"""
+Herramientas de línea de comandos de PromptGuard. Se ejecutan con `python -m tools.<modulo>`.
+"""
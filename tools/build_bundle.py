@@ -0,0 +1,135 @@
+"""
+Arma un paquete de despliegue mínimo para Linux (zip deploy / run-from-package).
+
+El venv `PromtGuard/` del repo es de macOS (`*-darwin.so`) y no sirve en el
+worker de Linux; si se publica tal cual, el runtime descomprime 60+ MB que no
+usa. Este script copia sólo lo que el worker carga (`function_app.py`,
+`host.json`, `shared_code/`) e instala las dependencias como wheels de Linux
+en `.python_packages/lib/site-packages`, que es donde el worker las busca, sin
+caché de bytecode ni binarios de otras plataformas.
+
+Las dependencias de `requirements.txt` que el código de la función no importa
+(`EXCLUDED_REQUIREMENTS`, usadas sólo por el notebook) no se instalan.
+
+Uso:
+    python -m tools.build_bundle                      # dist/promptguard.zip
+    python -m tools.build_bundle --python-version 3.11
+    az functionapp deployment source config-zip -g <grupo> -n <app> --src dist/promptguard.zip
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import zipfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_FILES = ["function_app.py", "host.json", "requirements.txt"]
+APP_DIRS = ["shared_code"]
+
+# Paquetes que sólo usa el notebook; la función nunca los importa
+EXCLUDED_REQUIREMENTS = {"azure-openai", "azure-ai-ml"}
+
+# Archivos que no sirven en el worker de Linux
+FOREIGN_BINARY_MARKERS = ("-darwin.so", ".dylib", "-win_amd64.pyd", "-win32.pyd")
+
+
+def _requirement_name(line):
+    for separator in ("@", "==", ">=", "<=", "~=", "!=", ">", "<", "[", ";", " "):
+        line = line.split(separator)[0]
+    return line.strip().lower().replace("_", "-")
+
+
+def runtime_requirements(path):
+    """
+    Líneas de `requirements.txt` sin comentarios ni `EXCLUDED_REQUIREMENTS`.
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines
+            if line and not line.startswith("#") and _requirement_name(line) not in EXCLUDED_REQUIREMENTS]
+
+
+def copy_app(target):
+    ignore = shutil.ignore_patterns("__pycache__", "*.pyc")
+    for name in APP_FILES:
+        shutil.copy2(os.path.join(REPO_ROOT, name), os.path.join(target, name))
+    for name in APP_DIRS:
+        shutil.copytree(os.path.join(REPO_ROOT, name), os.path.join(target, name), ignore=ignore)
+
+
+def install_packages(target, requirements, python_version, platform):
+    site_packages = os.path.join(target, ".python_packages", "lib", "site-packages")
+    requirements_file = os.path.join(target, ".requirements-runtime.txt")
+    with open(requirements_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(requirements) + "\n")
+    try:
+        subprocess.run([
+            sys.executable, "-m", "pip", "install", "--quiet", "--no-compile",
+            "--target", site_packages,
+            "--platform", platform, "--implementation", "cp", "--python-version", python_version,
+            "--only-binary=:all:", "-r", requirements_file,
+        ], check=True)
+    finally:
+        os.remove(requirements_file)
+    return site_packages
+
+
+def prune(root):
+    """
+    Borra caché de bytecode y binarios de otras plataformas; devuelve cuántos archivos quitó.
+    """
+    removed = 0
+    for directory, dirnames, filenames in os.walk(root):
+        if "__pycache__" in dirnames:
+            dirnames.remove("__pycache__")
+            shutil.rmtree(os.path.join(directory, "__pycache__"))
+            removed += 1
+        for filename in filenames:
+            if filename.endswith(".pyc") or filename.endswith(FOREIGN_BINARY_MARKERS):
+                os.remove(os.path.join(directory, filename))
+                removed += 1
+    return removed
+
+
+def write_zip(source, path):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for directory, _, filenames in os.walk(source):
+            for filename in sorted(filenames):
+                full = os.path.join(directory, filename)
+                bundle.write(full, os.path.relpath(full, source))
+
+
+def _size_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 2**20
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "dist"), help="carpeta de salida")
+    parser.add_argument("--python-version", default="3.10", help="versión de Python del Function App")
+    parser.add_argument("--platform", default="manylinux2014_x86_64")
+    parser.add_argument("--skip-install", action="store_true", help="sólo empaqueta el código (dependencias por build remoto)")
+    args = parser.parse_args()
+
+    staging = os.path.join(args.output, "bundle")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    copy_app(staging)
+    requirements = runtime_requirements(os.path.join(REPO_ROOT, "requirements.txt"))
+    if not args.skip_install:
+        site_packages = install_packages(staging, requirements, args.python_version, args.platform)
+        print(f"dependencias: {len(requirements)} requeridas, {_size_mb(site_packages):.1f} MB instalados")
+    print(f"archivos descartados: {prune(staging)}")
+
+    bundle = os.path.join(args.output, "promptguard.zip")
+    write_zip(staging, bundle)
+    print(f"paquete: {bundle} ({_size_mb(bundle):.1f} MB comprimido, {_size_mb(staging):.1f} MB descomprimido)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Validación masiva de prompts desde un archivo JSONL (`{"prompt": ...}` por línea).
+
+Lee el archivo en streaming (nunca lo carga entero en memoria), valida cada
+prompt con la misma lógica que `validatePrompt` (`check_content_safety`: pre-filtro,
+caché y Content Safety) con concurrencia acotada, y escribe los resultados en
+el mismo orden que la entrada. Cada línea de salida es el registro original
+más `is_flagged` y `details`.
+
+El progreso se guarda en un checkpoint (`<salida>.ckpt`); si el proceso se
+corta, al volver a ejecutarlo continúa desde la última línea confirmada.
+
+Uso:
+    python -m tools.bulk_validate prompts.jsonl -o resultados.jsonl --concurrency 32
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"input_offset": 0, "output_offset": 0, "lines": 0}
+
+
+def save_checkpoint(path, checkpoint):
+    # Escritura atómica: nunca queda un checkpoint a medio escribir
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def validate_line(check, line):
+    try:
+        record = json.loads(line)
+        prompt = record.get("prompt") if isinstance(record, dict) else None
+    except ValueError as e:
+        return {"error": f"JSON inválido: {str(e)}"}
+    if not prompt:
+        return {**record, "error": "El prompt es requerido"} if isinstance(record, dict) else {"error": "El prompt es requerido"}
+    if not isinstance(prompt, str):
+        return {**record, "error": "El prompt debe ser texto"}
+    return {**record, **check(prompt)}
+
+
+def run(input_path, output_path, checkpoint_path, concurrency, checkpoint_every):
+    from shared_code.content_safety import check_content_safety
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint["lines"]:
+        logging.info(f"Reanudando desde la línea {checkpoint['lines']}")
+
+    with open(input_path, "rb") as source, open(output_path, "ab") as sink, \
+            ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Se descarta lo escrito después del último checkpoint (si lo hubo)
+        sink.truncate(checkpoint["output_offset"])
+        sink.seek(checkpoint["output_offset"])
+        source.seek(checkpoint["input_offset"])
+
+        pending = deque()
+        lines = checkpoint["lines"]
+        start = time.perf_counter()
+
+        def flush_oldest():
+            nonlocal lines
+            future, input_offset = pending.popleft()
+            sink.write(json.dumps(future.result(), ensure_ascii=False).encode("utf-8") + b"\n")
+            lines += 1
+            if lines % checkpoint_every == 0:
+                sink.flush()
+                os.fsync(sink.fileno())
+                save_checkpoint(checkpoint_path, {"input_offset": input_offset, "output_offset": sink.tell(), "lines": lines})
+                rate = (lines - checkpoint["lines"]) / (time.perf_counter() - start)
+                logging.info(f"{lines} líneas procesadas ({rate:.1f}/s)")
+
+        while True:
+            line = source.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            # Ventana acotada: como mucho 2x`concurrency` líneas en memoria
+            if len(pending) >= concurrency * 2:
+                flush_oldest()
+            pending.append((pool.submit(validate_line, check_content_safety, line), source.tell()))
+
+        while pending:
+            flush_oldest()
+
+        sink.flush()
+        os.fsync(sink.fileno())
+        save_checkpoint(checkpoint_path, {"input_offset": source.tell(), "output_offset": sink.tell(), "lines": lines})
+
+    logging.info(f"Listo: {lines} líneas en {output_path}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="archivo JSONL de entrada")
+    parser.add_argument("-o", "--output", required=True, help="archivo JSONL de salida")
+    parser.add_argument("--checkpoint", help="archivo de checkpoint (por defecto <salida>.ckpt)")
+    parser.add_argument("--concurrency", type=int, default=16, help="llamadas simultáneas a Content Safety")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="líneas entre checkpoints")
+    parser.add_argument("--restart", action="store_true", help="ignora el checkpoint y empieza de cero")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stderr)
+    os.environ.setdefault("HTTP_POOL_SIZE", str(args.concurrency))
+
+    checkpoint_path = args.checkpoint or f"{args.output}.ckpt"
+    if args.restart:
+        for path in (checkpoint_path, args.output):
+            if os.path.exists(path):
+                os.remove(path)
+
+    run(args.input, args.output, checkpoint_path, args.concurrency, args.checkpoint_every)
+
+
+if __name__ == "__main__":
+    main()
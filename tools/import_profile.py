@@ -0,0 +1,104 @@
+"""
+Reporte de tiempos de importación y de arranque en frío de `function_app`.
+
+En el plan de consumo cada instancia nueva importa `function_app` antes de
+atender la primera solicitud, así que todo lo que se importa a nivel de
+módulo se suma al arranque en frío. Este script:
+
+1. Importa el módulo en un proceso nuevo con `python -X importtime` y lista
+   los paquetes que más tardan (tiempo acumulado y propio, en ms).
+2. Mide el arranque en frío: tiempo de pared de `--runs` procesos nuevos que
+   importan el módulo, comparado con un intérprete vacío.
+
+Uso:
+    python -m tools.import_profile --top 20 --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    # Sin .pyc de una corrida anterior en memoria; los del disco sí se usan, como en Azure
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def import_times(module):
+    """
+    Devuelve `[(nombre, propio_us, acumulado_us, profundidad), ...]` de `python -X importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=_env(), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            entries.append((name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip())) // 2))
+        except ValueError:
+            continue
+    return entries
+
+
+def cold_start(module, runs):
+    """
+    Mediana (ms) del tiempo de pared de un proceso nuevo vacío y de uno que importa `module`.
+    """
+    def measure(code):
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=_env(), check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    return measure("pass"), measure(f"import {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="function_app")
+    parser.add_argument("--top", type=int, default=15, help="paquetes a listar")
+    parser.add_argument("--runs", type=int, default=5, help="procesos para medir el arranque en frío")
+    args = parser.parse_args()
+
+    entries = import_times(args.module)
+    total = next((cumulative for name, _, cumulative, depth in entries if name == args.module and depth == 0), 0)
+    print(f"import {args.module}: {total / 1000:.1f} ms (según -X importtime)\n")
+
+    # Paquetes de primer nivel: agrupa `azure.ai.textanalytics._generated...` bajo su raíz
+    packages = {}
+    for name, self_us, _, _ in entries:
+        root = ".".join(name.split(".")[:3]) if name.startswith(("azure.", "azurefunctions.")) else name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    print(f"{'paquete':<40} {'ms':>8} {'%':>6}")
+    for name, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<40} {self_us / 1000:>8.1f} {100 * self_us / total if total else 0:>5.1f}%")
+
+    print(f"\n{'módulo (acumulado)':<40} {'ms':>8}")
+    for name, _, cumulative, _ in sorted(entries, key=lambda entry: entry[2], reverse=True)[:args.top]:
+        print(f"{name:<40} {cumulative / 1000:>8.1f}")
+
+    if args.runs:
+        interpreter, with_module = cold_start(args.module, args.runs)
+        print(f"\narranque en frío (mediana de {args.runs}): intérprete {interpreter:.0f} ms, "
+              f"con {args.module} {with_module:.0f} ms (+{with_module - interpreter:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Cola local que reemplaza a Azure Storage Queues para probar `validatePromptQueue`.
+
+Imita lo que hace el runtime: desencola en lotes (`--batch-size`, como
+`queues.batchSize` de host.json), invoca la función una vez por mensaje con
+los lotes en paralelo, borra los mensajes procesados, reintenta los que
+fallan y manda a `<cola>-poison` los que fallan `--max-dequeue-count` veces.
+
+El archivo de entrada tiene un `{"prompt": ...}` por línea; se agrupan de a
+`--prompts-per-message` en cada mensaje. Los mensajes de salida (un veredicto
+por prompt) se escriben en el archivo de salida, uno por línea.
+
+Uso:
+    python -m tools.local_queue prompts.jsonl -o veredictos.jsonl --prompts-per-message 50
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import sys
+import time
+import uuid
+from collections import deque
+
+import azure.functions as func
+
+
+class LocalMessage(func.QueueMessage):
+    def __init__(self, *, id, body, dequeue_count):
+        super().__init__(id=id, body=body)
+        self._dequeue_count = dequeue_count
+
+    @property
+    def dequeue_count(self):
+        return self._dequeue_count
+
+
+class OutputCollector(func.Out):
+    """
+    Implementación local del binding de salida: guarda lo que la función asigna con `set`.
+    """
+
+    def __init__(self):
+        self._value = None
+
+    def set(self, val):
+        self._value = val
+
+    def get(self):
+        return self._value
+
+
+class LocalQueue:
+    """
+    Cola en memoria con contador de desencolados y cola "poison".
+    """
+
+    def __init__(self, name, max_dequeue_count=5):
+        self.name = name
+        self.max_dequeue_count = max_dequeue_count
+        self._messages = deque()
+        self.poison = []
+
+    def send(self, body):
+        self._messages.append({"id": str(uuid.uuid4()), "body": body, "dequeue_count": 0})
+
+    def receive(self, batch_size):
+        batch = []
+        while self._messages and len(batch) < batch_size:
+            message = self._messages.popleft()
+            message["dequeue_count"] += 1
+            batch.append(message)
+        return batch
+
+    def retry(self, message):
+        if message["dequeue_count"] >= self.max_dequeue_count:
+            logging.error(f"Mensaje {message['id']} movido a {self.name}-poison")
+            self.poison.append(message)
+        else:
+            self._messages.append(message)
+
+    def __len__(self):
+        return len(self._messages)
+
+
+async def drain(queue, function, batch_size, on_output):
+    """
+    Procesa la cola hasta vaciarla, un lote de `batch_size` mensajes en paralelo por vez.
+    """
+    processed = 0
+
+    async def invoke(message):
+        nonlocal processed
+        out = OutputCollector()
+        try:
+            await function(LocalMessage(id=message["id"], body=message["body"].encode("utf-8"),
+                                        dequeue_count=message["dequeue_count"]), out)
+        except Exception as e:
+            logging.error(f"Error al procesar el mensaje {message['id']}: {str(e)}")
+            queue.retry(message)
+            return
+        for output in out.get() or []:
+            on_output(output)
+        processed += 1
+
+    while len(queue):
+        await asyncio.gather(*(invoke(message) for message in queue.receive(batch_size)))
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="archivo JSONL con un `{\"prompt\": ...}` por línea")
+    parser.add_argument("-o", "--output", required=True, help="archivo JSONL con los veredictos")
+    parser.add_argument("--prompts-per-message", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=16, help="mensajes desencolados por vez (queues.batchSize)")
+    parser.add_argument("--max-dequeue-count", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stderr)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    import function_app
+
+    queue = LocalQueue("prompts-to-validate", args.max_dequeue_count)
+    with open(args.input, encoding="utf-8") as f:
+        records = (json.loads(line) for line in f if line.strip())
+        for number in itertools.count():
+            chunk = list(itertools.islice(records, args.prompts_per_message))
+            if not chunk:
+                break
+            queue.send(json.dumps({"batchId": f"lote-{number}", "prompts": chunk}, ensure_ascii=False))
+
+    start = time.perf_counter()
+    prompts = 0
+    with open(args.output, "w", encoding="utf-8") as out:
+        def write(output):
+            nonlocal prompts
+            prompts += 1
+            out.write(output + "\n")
+
+        messages = asyncio.run(drain(queue, function_app.validate_prompt_queue, args.batch_size, write))
+
+    elapsed = time.perf_counter() - start
+    logging.info(f"{messages} mensajes, {prompts} veredictos en {elapsed:.1f}s ({prompts / elapsed:.1f} prompts/s); "
+                 f"poison: {len(queue.poison)}")
+
+
+if __name__ == "__main__":
+    main()
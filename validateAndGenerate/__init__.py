@@ -0,0 +1,8 @@
+import logging
+import azure.functions as func
+
+from shared_code.engine import handle_validate_and_generate
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info("Procesando una solicitud en validateAndGenerate.")
+    return await handle_validate_and_generate(req)